@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark of export_rows on a local SQLite copy of the users table.
+
+Usage: ./bench_export.py [rows ...]   (default: 10000 100000)
+
+Fills a users table (schema of main.sql) in a temporary SQLite file,
+then exports it to a redacting logger writing to /dev/null: streamed
+with export_rows, and loaded with fetchall first like main() used to.
+Rows/sec and the peak memory allocated during each export are printed
+(tracemalloc slows both exports down alike).
+"""
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from filtered_logger import PII_FIELDS, RedactingFormatter, export_rows
+
+COLUMNS = ("name", "email", "phone", "ssn", "password", "ip",
+           "last_login", "user_agent")
+
+
+def fill(connection, rows):
+    """
+    Creates and fills the users table.
+    """
+    connection.execute("CREATE TABLE users ({})".format(
+        ", ".join(f"{column} TEXT" for column in COLUMNS)))
+    connection.executemany(
+        "INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        ((f"User {i}", f"user{i}@holberton.io", "(473) 401-4253",
+          f"261-72-{i % 10000:04}", "K5?BMNv", "60ed:c396:2ff:244::1",
+          "2019-11-14 06:14:24", "Mozilla/5.0 (X11; Linux x86_64)")
+         for i in range(rows)))
+    connection.commit()
+
+
+class LoadedCursor:
+    """
+    Cursor over the rows of another one, all fetched at once.
+    """
+
+    def __init__(self, cursor):
+        """
+        Fetches all the rows of `cursor`.
+        """
+        self.description = cursor.description
+        self.rows = cursor.fetchall()
+        self.position = 0
+
+    def fetchmany(self, size):
+        """
+        Returns the next `size` rows.
+        """
+        rows = self.rows[self.position:self.position + size]
+        self.position += size
+        return rows
+
+
+def fetchall_rows(cursor, logger):
+    """
+    The export of main() before streaming: all the rows in memory first.
+    """
+    export_rows(LoadedCursor(cursor), logger)
+
+
+def measure(path, logger, export):
+    """
+    Returns (rows/sec, peak MB) of an export of the users table.
+    """
+    connection = sqlite3.connect(path)
+    cursor = connection.cursor()
+    cursor.execute("SELECT * FROM users")
+    tracemalloc.start()
+    start = time.perf_counter()
+    export(cursor, logger)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    rows = connection.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    connection.close()
+    return rows / elapsed, peak / 2 ** 20
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    logger = logging.getLogger("bench_export")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    handler = logging.StreamHandler(open(os.devnull, "w"))
+    handler.setFormatter(RedactingFormatter(fields=PII_FIELDS))
+    logger.addHandler(handler)
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "users.db")
+            connection = sqlite3.connect(path)
+            fill(connection, size)
+            connection.close()
+            streamed = measure(path, logger, export_rows)
+            loaded = measure(path, logger, fetchall_rows)
+        print(f"{size:>8} rows: streamed {streamed[0]:8.0f} rows/s "
+              f"peak {streamed[1]:7.1f}MB, fetchall {loaded[0]:8.0f} rows/s "
+              f"peak {loaded[1]:7.1f}MB")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark of redact_logs.redact_file by number of workers.
+
+Usage: ./bench_redact_logs.py [size in MB] [workers ...]
+       (default: 1024MB, 1 worker then one per CPU)
+
+Generates a log file of the given size in a temporary directory, then
+redacts it with each number of workers and prints the throughput. Every
+run must give the same output, with no PII value left.
+"""
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+from redact_logs import redact_file
+
+LINE = ("[HOLBERTON] user_data INFO 2019-11-19 18:24:25,105: "
+        "name={i}; email=user{i}@holberton.io; phone=(473) 401-4253; "
+        "ssn=261-72-{i:04}; password=K5?BMNv; ip=60ed:c396:2ff::1; "
+        "last_login=2019-11-14 06:14:24; user_agent=Mozilla/5.0 (X11);\n")
+
+
+def generate(path, size):
+    """
+    Writes about `size` bytes of log lines.
+    """
+    with open(path, "w") as f:
+        written = i = 0
+        while written < size:
+            block = "".join(LINE.format(i=i + j) for j in range(10000))
+            f.write(block)
+            written += len(block)
+            i += 10000
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    workers = ([int(arg) for arg in sys.argv[2:]] or
+               sorted({1, os.cpu_count() or 1}))
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "users.log")
+        target = os.path.join(tmp, "users.redacted.log")
+        generate(source, size << 20)
+        print(f"{os.path.getsize(source) / 2 ** 20:.0f}MB, "
+              f"{os.cpu_count()} CPUs")
+        digests = set()
+        for count in workers:
+            start = time.perf_counter()
+            with open(target, "wb") as output:
+                read = redact_file(source, output, workers=count)
+            elapsed = time.perf_counter() - start
+            with open(target, "rb") as f:
+                digest = hashlib.file_digest(f, "sha256").hexdigest()
+                f.seek(0)
+                head = f.read(1 << 20)
+            assert b"email=user" not in head and b"password=K5" not in head
+            digests.add(digest)
+            print(f"{count:>3} workers: {read / 2 ** 20 / elapsed:7.1f}MB/s "
+                  f"({elapsed:.1f}s)")
+        assert len(digests) == 1, "outputs differ between worker counts"
+        print("OK")
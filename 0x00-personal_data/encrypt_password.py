@@ -2,28 +2,36 @@
 """
 Module for password
 """
+from hasher import HasherBusy, HasherTimeout, PasswordHasher  # noqa: F401
 
-import bcrypt
+# inline bcrypt unless HASH_WORKERS asks for a pool: the workers are
+# spawned and re-run the main script, which must then be guarded by
+# `if __name__ == "__main__"`
+HASHER = PasswordHasher.from_env(default_workers=0)
 
 
 def hash_password(password):
     """
-    Hashes a password using bcrypt.
+    Hashes a password using bcrypt, with HASHER (in the calling thread
+    unless HASH_WORKERS is set, see hasher.py for HASH_WORKERS,
+    HASH_QUEUE_DEPTH and HASH_TIMEOUT).
 
     Args:
         password (str): The password to hash.
 
     Returns:
         bytes: The hashed password.
+
+    Raises:
+        HasherBusy: If too many hashings are pending.
+        HasherTimeout: If the hashing took more than HASH_TIMEOUT.
     """
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(password.encode(), salt)
-    return hashed_password
+    return HASHER.hash(password)
 
 
 def is_valid(hashed_password, password):
     """
-    Validates a password against its hashed version.
+    Validates a password against its hashed version, with HASHER.
 
     Args:
         hashed_password (bytes): The hashed password.
@@ -31,8 +39,12 @@ def is_valid(hashed_password, password):
 
     Returns:
         bool: True if password matches the hashed password, False otherwise.
+
+    Raises:
+        HasherBusy: If too many hashings are pending.
+        HasherTimeout: If the check took more than HASH_TIMEOUT.
     """
-    return bcrypt.checkpw(password.encode(), hashed_password)
+    return HASHER.check(password, hashed_password)
 
 
 if __name__ == "__main__":
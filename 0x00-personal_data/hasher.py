@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""Password hashing offloaded to a bounded pool of worker processes.
+
+PasswordHasher.from_env() reads its settings from the environment:
+- HASH_WORKERS: number of processes (0 runs bcrypt in the calling
+  thread). The default is given by the caller: the CPU count for the
+  HASHER of the 0x03 service, 0 in 0x00-personal_data/encrypt_password.py
+  whose callers are plain scripts (spawned workers re-run an unguarded
+  main script);
+- HASH_QUEUE_DEPTH: maximum number of pending hashings (4 per worker by
+  default), past which HasherBusy is raised;
+- HASH_TIMEOUT: maximum time of one hashing in seconds (5 by default),
+  past which HasherTimeout is raised.
+
+Identical copies back 0x00-personal_data/encrypt_password.py and
+0x03-user_authentication_service/auth.py: keep them in sync.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    """Raised when too many hashings are already pending.
+    """
+
+
+class HasherTimeout(HasherBusy):
+    """Raised when a hashing didn't finish in time.
+    """
+
+
+def _hashpw(password: bytes) -> bytes:
+    """Hashes a password with a new salt (runs in a worker).
+    """
+    return bcrypt.hashpw(password, bcrypt.gensalt())
+
+
+def _try_hashpw(password: bytes) -> Tuple[Optional[bytes], Optional[str]]:
+    """Hashes a password, returns (hash, None) or (None, error) instead
+    of raising (runs in a worker).
+    """
+    try:
+        return _hashpw(password), None
+    except Exception as e:
+        return None, str(e) or type(e).__name__
+
+
+def _checkpw(password: bytes, hashed_password: bytes) -> bool:
+    """Checks a password against its hash (runs in a worker).
+    """
+    return bcrypt.checkpw(password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs bcrypt in a pool of worker processes, so a burst of logins
+    doesn't pin the request threads.
+
+    At most `max_pending` hashings are queued or running: past that,
+    new ones are rejected right away with HasherBusy instead of piling
+    up, and a hashing taking more than `timeout` seconds raises
+    HasherTimeout. With `workers` == 0 bcrypt runs in the calling thread.
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = None,
+                 timeout: float = 5.0) -> None:
+        """Initializes the hasher, the pool starts on first use.
+
+        Args:
+            workers (int): Number of processes (CPU count by default).
+            max_pending (int): Queue depth limit (4 per worker by default).
+            timeout (float): Maximum time of one hashing, in seconds.
+        """
+        self.workers = (workers if workers is not None
+                        else os.cpu_count() or 1)
+        self.max_pending = (max_pending if max_pending is not None
+                            else 4 * max(self.workers, 1))
+        self.timeout = timeout
+        self.rejected = 0
+        self.timed_out = 0
+        self.__pending = threading.BoundedSemaphore(self.max_pending)
+        self.__pool = None
+        self.__lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, default_workers: int = None) -> "PasswordHasher":
+        """Builds a hasher from HASH_WORKERS (`default_workers` if unset,
+        CPU count if None), HASH_QUEUE_DEPTH and HASH_TIMEOUT.
+        """
+        workers = _env_int("HASH_WORKERS")
+        return cls(default_workers if workers is None else workers,
+                   _env_int("HASH_QUEUE_DEPTH"),
+                   float(os.getenv("HASH_TIMEOUT", "5")))
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Queues `fn(*args)` in the pool.
+
+        Raises:
+            HasherBusy: If `max_pending` hashings are already pending.
+        """
+        if not self.__pending.acquire(blocking=False):
+            self.rejected += 1
+            raise HasherBusy("too many pending password hashings")
+        try:
+            future = self._pool().submit(fn, *args)
+        except Exception:
+            self.__pending.release()
+            raise
+        # the slot is freed when the work ends, even after a timeout
+        future.add_done_callback(lambda _: self.__pending.release())
+        return future
+
+    def run(self, fn: Callable, *args):
+        """Runs `fn(*args)` in the pool and waits for its result.
+
+        Raises:
+            HasherBusy: If `max_pending` hashings are already pending.
+            HasherTimeout: If it took more than `timeout` seconds.
+        """
+        if self.workers == 0:
+            return fn(*args)
+        future = self.submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self.timed_out += 1
+            raise HasherTimeout("password hashing timed out")
+
+    async def run_async(self, fn: Callable, *args):
+        """Like `run`, awaiting the pool instead of blocking the thread
+        (inline bcrypt goes to the default executor of the loop).
+        """
+        loop = asyncio.get_running_loop()
+        if self.workers == 0:
+            return await loop.run_in_executor(None, fn, *args)
+        future = asyncio.wrap_future(self.submit(fn, *args))
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise HasherTimeout("password hashing timed out")
+
+    def hash(self, password: str) -> bytes:
+        """Hashes a password.
+        """
+        return self.run(_hashpw, password.encode("utf-8"))
+
+    def check(self, password: str, hashed_password: bytes) -> bool:
+        """Checks a password against its hash.
+        """
+        return self.run(_checkpw, password.encode("utf-8"), hashed_password)
+
+    def hash_many(self, passwords: Iterable[str]
+                  ) -> List[Tuple[Optional[bytes], Optional[str]]]:
+        """Hashes passwords on all the workers at once, for batch jobs:
+        it bypasses the queue depth limit and the timeout.
+
+        Returns:
+            List[Tuple[Optional[bytes], Optional[str]]]: (hash, None)
+                or (None, error) for each password, in order: a password
+                that can't be hashed doesn't fail the others.
+        """
+        results = []
+        encoded = []
+        for password in passwords:
+            if not isinstance(password, str):
+                results.append((None, "password must be a string"))
+                continue
+            try:
+                encoded.append((len(results), password.encode("utf-8")))
+                results.append(None)
+            except UnicodeError as e:
+                results.append((None, str(e)))
+        if self.workers == 0:
+            hashed = [_try_hashpw(password) for _, password in encoded]
+        else:
+            chunksize = max(1, len(encoded) // (4 * self.workers))
+            hashed = self._pool().map(
+                _try_hashpw, [password for _, password in encoded],
+                chunksize=chunksize)
+        for (i, _), result in zip(encoded, hashed):
+            results[i] = result
+        return results
+
+    async def hash_async(self, password: str) -> bytes:
+        """Hashes a password without blocking the event loop.
+        """
+        return await self.run_async(_hashpw, password.encode("utf-8"))
+
+    async def check_async(self, password: str,
+                          hashed_password: bytes) -> bool:
+        """Checks a password without blocking the event loop.
+        """
+        return await self.run_async(_checkpw, password.encode("utf-8"),
+                                    hashed_password)
+
+    def shutdown(self) -> None:
+        """Stops the worker processes.
+        """
+        with self.__lock:
+            if self.__pool is not None:
+                self.__pool.shutdown()
+                self.__pool = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        """The pool, started on first use. Workers are spawned, not
+        forked: the server process runs threads.
+        """
+        with self.__lock:
+            if self.__pool is None:
+                self.__pool = ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context("spawn"))
+            return self.__pool
+
+
+def _env_int(name: str) -> int:
+    """Integer environment variable, None if unset or empty.
+    """
+    value = os.getenv(name, "")
+    return int(value) if value != "" else None
+
+
+HASHER = PasswordHasher.from_env()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Redaction of log files on all the cores.
+
+Usage: ./redact_logs.py [options] INPUT [OUTPUT]
+
+Applies the filter_datum rules (PII_FIELDS, "***", ";" by default) to
+every line of INPUT and writes the result to OUTPUT (standard output if
+missing). INPUT is memory-mapped and cut on line boundaries into chunks
+redacted by a pool of processes; the chunks are written in their
+original order. A value ends at a separator or at the end of its line.
+"""
+import argparse
+import mmap
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from filtered_logger import PII_FIELDS, get_redactor
+
+CHUNK_SIZE = 16 * 2 ** 20
+
+_data = None
+_redactor = None
+
+
+def chunks(data, chunk_size):
+    """
+    Cuts `data` in (start, end) ranges of about `chunk_size` bytes that
+    end right after a newline (or at the end of the data).
+    """
+    start = 0
+    while start < len(data):
+        end = data.find(b"\n", min(start + chunk_size, len(data)) - 1)
+        end = len(data) if end < 0 else end + 1
+        yield start, end
+        start = end
+
+
+def _init_worker(path, fields, redaction, separator):
+    """
+    Maps the input file and compiles the redactor in a worker.
+    """
+    global _data, _redactor
+    with open(path, "rb") as f:
+        _data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _redactor = get_redactor(fields, redaction, separator + "\n")
+
+
+def _redact_chunk(bounds):
+    """
+    Redacts one chunk of the input.
+    """
+    start, end = bounds
+    text = _data[start:end].decode("utf-8", "surrogateescape")
+    return _redactor.redact(text).encode("utf-8", "surrogateescape")
+
+
+def redact_file(path, output, fields=PII_FIELDS, redaction="***",
+                separator=";", workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Redacts a file into a binary stream.
+
+    Args:
+        path (str): The input file.
+        output: Binary stream written to.
+        fields (tuple): Fields to redact.
+        redaction (str): String to use for redaction.
+        separator (str): Separator used to separate fields in the lines.
+        workers (int): Number of processes (CPU count by default).
+        chunk_size (int): Size of the chunks in bytes.
+
+    Returns:
+        int: The number of bytes read.
+    """
+    workers = workers or os.cpu_count() or 1
+    fields = tuple(fields)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return 0
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    with data, ProcessPoolExecutor(
+            workers, initializer=_init_worker,
+            initargs=(path, fields, redaction, separator)) as pool:
+        # at most 2 chunks per worker in flight, written in order
+        pending = []
+        for bounds in chunks(data, chunk_size):
+            pending.append(pool.submit(_redact_chunk, bounds))
+            if len(pending) >= 2 * workers:
+                output.write(pending.pop(0).result())
+        for future in pending:
+            output.write(future.result())
+        return len(data)
+
+
+def main():
+    """
+    Redacts the file given on the command line.
+    """
+    parser = argparse.ArgumentParser(description="Redact PII in log files.")
+    parser.add_argument("input")
+    parser.add_argument("output", nargs="?")
+    parser.add_argument("--fields", default=",".join(PII_FIELDS),
+                        help="comma separated fields to redact")
+    parser.add_argument("--redaction", default="***")
+    parser.add_argument("--separator", default=";")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE >> 20,
+                        help="size of the chunks in MB")
+    args = parser.parse_args()
+
+    output = (open(args.output, "wb") if args.output
+              else sys.stdout.buffer)
+    start = time.perf_counter()
+    with output:
+        size = redact_file(args.input, output, args.fields.split(","),
+                           args.redaction, args.separator, args.workers,
+                           args.chunk_size << 20)
+    elapsed = time.perf_counter() - start
+    print(f"{size / 2 ** 20:.0f}MB redacted in {elapsed:.1f}s "
+          f"({size / 2 ** 20 / elapsed:.1f}MB/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,9 @@ from api.v1.views import app_views
 from flask import Flask, jsonify, abort, request
 from flask_cors import (CORS, cross_origin)
 from api.v1.auth.auth import Auth
+from api.v1.metrics import METRICS
 import os
+import time
 
 
 app = Flask(__name__)
@@ -47,6 +49,24 @@ def forbidden(error):
     return jsonify({"error": "Forbidden"}), 403
 
 
+@app.before_request
+def start_timer():
+    """ Time the request (registered first: auth included) """
+    request.start_time = time.perf_counter()
+
+
+@app.after_request
+def record_metrics(response):
+    """ Record the count, status and latency of the request """
+    start_time = getattr(request, 'start_time', None)
+    if start_time is not None:
+        rule = request.url_rule
+        METRICS.observe(rule.rule if rule is not None else 'unmatched',
+                        request.method, response.status_code,
+                        time.perf_counter() - start_time)
+    return response
+
+
 @app.before_request
 def before_request_handler():
     """ Method to filter requests before handling """
@@ -54,7 +74,7 @@ def before_request_handler():
         return
 
     excluded_paths = ['/api/v1/status/', '/api/v1/unauthorized/',
-                      '/api/v1/forbidden/']
+                      '/api/v1/forbidden/', '/api/v1/metrics/']
     if not auth.require_auth(request.path, excluded_paths):
         return
 
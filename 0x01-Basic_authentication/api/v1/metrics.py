@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Metrics module
+"""
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+import threading
+
+# upper bounds of the latency buckets, in seconds (plus +Inf)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Metrics:
+    """
+    Request counts by endpoint, method and status, and latency
+    histograms by endpoint and method.
+
+    Each thread records into its own shard without any lock; shards are
+    merged when the metrics are read. The shards of finished threads
+    (one thread per request with the threaded server) are folded into a
+    common total whenever a new thread registers its shard, so there are
+    never more shards than live threads, scraped or not.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        """
+        Initialize empty metrics.
+
+        Args:
+            buckets (tuple): Upper bounds of the latency buckets.
+        """
+        self.buckets = tuple(buckets)
+        self.__local = threading.local()
+        self.__shards = []
+        self.__retired = ({}, {})
+        self.__lock = threading.Lock()
+
+    def observe(self, endpoint: str, method: str, status: int,
+                seconds: float):
+        """
+        Record one request.
+        """
+        shard = getattr(self.__local, 'shard', None)
+        if shard is None:
+            shard = self.__local.shard = ({}, {})
+            with self.__lock:
+                self.__retire_dead()
+                self.__shards.append((threading.current_thread(), shard))
+        statuses, histograms = shard
+        key = (endpoint, method, status)
+        statuses[key] = statuses.get(key, 0) + 1
+        histogram = histograms.get((endpoint, method))
+        if histogram is None:
+            histogram = histograms[(endpoint, method)] = \
+                [[0] * (len(self.buckets) + 1), 0.0]
+        histogram[0][bisect_left(self.buckets, seconds)] += 1
+        histogram[1] += seconds
+
+    def snapshot(self) -> Tuple[Dict[tuple, int], Dict[tuple, list]]:
+        """
+        Merge the shards of all the threads.
+
+        Returns:
+            tuple: (endpoint, method, status) -> count, and
+                (endpoint, method) -> [bucket counts, sum of latencies].
+        """
+        with self.__lock:
+            self.__retire_dead()
+            total = ({}, {})
+            self.__merge(total, self.__retired)
+            for _, shard in self.__shards:
+                self.__merge(total, shard)
+        return total
+
+    def shard_count(self) -> int:
+        """
+        Number of registered shards (at most one per live thread, plus
+        the ones of threads that ended since the last registration).
+        """
+        with self.__lock:
+            return len(self.__shards)
+
+    def __retire_dead(self):
+        """
+        Fold the shards of finished threads into the retired total
+        (called with the lock held).
+        """
+        alive = []
+        for thread, shard in self.__shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self.__merge(self.__retired, shard)
+        self.__shards = alive
+
+    def quantile(self, counts: List[int], q: float) -> float:
+        """
+        Estimate a quantile from bucket counts, interpolating linearly
+        inside its bucket.
+        """
+        total = sum(counts)
+        if total == 0:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return lower + (self.buckets[i] - lower) * \
+                    (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def render(self) -> str:
+        """
+        The metrics in the Prometheus text exposition format.
+        """
+        statuses, histograms = self.snapshot()
+        lines = ["# HELP http_requests_total Requests by endpoint, method "
+                 "and status.",
+                 "# TYPE http_requests_total counter"]
+        for (endpoint, method, status), count in sorted(statuses.items()):
+            lines.append('http_requests_total{{endpoint="{}",method="{}",'
+                         'status="{}"}} {}'.format(
+                             self.__escape(endpoint), method, status, count))
+        lines += ["# HELP http_request_duration_seconds Request latency.",
+                  "# TYPE http_request_duration_seconds histogram"]
+        quantiles = []
+        for (endpoint, method), (counts, total) in sorted(
+                histograms.items()):
+            labels = 'endpoint="{}",method="{}"'.format(
+                self.__escape(endpoint), method)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append('http_request_duration_seconds_bucket{{{},'
+                             'le="{}"}} {}'.format(
+                                 labels, '+Inf' if bound == float('inf')
+                                 else repr(bound), cumulative))
+            lines.append('http_request_duration_seconds_sum{{{}}} {!r}'
+                         .format(labels, total))
+            lines.append('http_request_duration_seconds_count{{{}}} {}'
+                         .format(labels, cumulative))
+            for q in QUANTILES:
+                quantiles.append(
+                    'http_request_duration_quantile_seconds{{{},'
+                    'quantile="{}"}} {:.6f}'.format(
+                        labels, q, self.quantile(counts, q)))
+        lines += ["# HELP http_request_duration_quantile_seconds Latency "
+                  "quantiles estimated from the histogram buckets.",
+                  "# TYPE http_request_duration_quantile_seconds gauge"]
+        lines += quantiles
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def __merge(total: tuple, shard: tuple):
+        """
+        Add the counters of a shard to `total` (called with the lock
+        held; the thread of the shard may still be writing to it).
+        """
+        statuses, histograms = total
+        for key, count in list(shard[0].items()):
+            statuses[key] = statuses.get(key, 0) + count
+        for key, (counts, seconds) in list(shard[1].items()):
+            histogram = histograms.get(key)
+            if histogram is None:
+                histograms[key] = [list(counts), seconds]
+            else:
+                histogram[0] = [a + b for a, b in zip(histogram[0], counts)]
+                histogram[1] += seconds
+
+    @staticmethod
+    def __escape(value: str) -> str:
+        """
+        Escape a label value.
+        """
+        return value.replace('\\', '\\\\').replace('"', '\\"') \
+            .replace('\n', '\\n')
+
+
+METRICS = Metrics()
@@ -7,7 +7,10 @@ from api.v1.views import app_views
 from flask import Flask, jsonify, abort, request
 from flask_cors import (CORS, cross_origin)
 from api.v1.auth.auth import Auth
+from api.v1.auth.path_matcher import PathMatcher
+from api.v1.metrics import METRICS
 import os
+import time
 from api.v1.auth.session_auth import SessionAuth
 import logging
 
@@ -29,10 +32,22 @@ if auth_type == 'basic_auth':
 elif auth_type == 'session_auth':
     from api.v1.auth.session_auth import SessionAuth
     auth = SessionAuth()
+    METRICS.add_collector(auth.session_metrics)
 else:
     from api.v1.auth.auth import Auth
     auth = Auth()
 
+if getenv('AUTH_STAGE_TIMERS', '').lower() in ('1', 'true', 'yes'):
+    # per-stage timings of the authentication in /api/v1/metrics; can
+    # also be switched at runtime with STAGE_TIMERS.set_enabled()
+    from api.v1.auth.stage_timers import STAGE_TIMERS
+    STAGE_TIMERS.enable()
+
+EXCLUDED_PATHS = PathMatcher(['/api/v1/status/', '/api/v1/unauthorized/',
+                              '/api/v1/forbidden/',
+                              '/api/v1/auth_session/login/',
+                              '/api/v1/metrics/'])
+
 
 @app.errorhandler(404)
 def not_found(error) -> str:
@@ -55,22 +70,43 @@ def forbidden(error):
     return jsonify({"error": "Forbidden"}), 403
 
 
+@app.before_request
+def start_timer():
+    """ Time the request (registered first: auth included) """
+    request.start_time = time.perf_counter()
+
+
+@app.after_request
+def record_metrics(response):
+    """ Record the count, status and latency of the request """
+    start_time = getattr(request, 'start_time', None)
+    if start_time is not None:
+        rule = request.url_rule
+        METRICS.observe(rule.rule if rule is not None else 'unmatched',
+                        request.method, response.status_code,
+                        time.perf_counter() - start_time)
+    return response
+
+
 @app.before_request
 def before_request_handler():
-    """ Method to filter requests before handling """
+    """ Method to filter requests before handling
+
+    The user of the request is resolved once, here, and kept in
+    `request.current_user` for the views.
+    """
+    request.current_user = None
     if auth is None:
         return
 
-    excluded_paths = ['/api/v1/status/', '/api/v1/unauthorized/',
-                      '/api/v1/forbidden/', '/api/v1/auth_session/login/']
-    if not auth.require_auth(request.path, excluded_paths):
+    if not auth.require_auth(request.path, EXCLUDED_PATHS):
         return
 
     if (auth.authorization_header(request) is None and
             auth.session_cookie(request) is None):
         abort(401)
 
-    if auth.current_user(request) is None:
+    if auth.resolve_current_user(request) is None:
         abort(403)
 
 
@@ -3,34 +3,34 @@
 Auth module
 """
 from flask import request
-from typing import List, TypeVar
-import re
+from functools import lru_cache
+from typing import List, Tuple, TypeVar, Union
 from os import getenv
+from api.v1.auth.path_matcher import PathMatcher
+
+
+@lru_cache(maxsize=32)
+def compile_excluded_paths(excluded_paths: Tuple[str, ...]) -> PathMatcher:
+    """ Return the (cached) PathMatcher of a tuple of excluded paths """
+    return PathMatcher(excluded_paths)
 
 
 class Auth:
-    def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
-        """ Method to check if authentication is required """
+    def require_auth(self, path: str,
+                     excluded_paths: Union[List[str], PathMatcher]) -> bool:
+        """ Method to check if authentication is required
+
+        `excluded_paths` is either a list of paths or, to skip compiling
+        it on each call, a PathMatcher built once.
+        """
         if path is None:
             return True
         if excluded_paths is None or len(excluded_paths) == 0:
             return True
 
-        # Ensure path ends with a slash for comparison
-        if not path.endswith('/'):
-            path += '/'
-
-        for excluded_path in excluded_paths:
-            # Convert the excluded path to a regular expression
-            if excluded_path.endswith('*'):
-                pattern = re.escape(excluded_path[:-1]) + '.*'
-            else:
-                pattern = re.escape(excluded_path) + '/?'
-
-            if re.match(pattern, path):
-                return False
-
-        return True
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = compile_excluded_paths(tuple(excluded_paths))
+        return not excluded_paths.match(path)
 
     def authorization_header(self, request=None) -> str:
         """ Method to get the authorization header """
@@ -44,6 +44,21 @@ class Auth:
         """ Method to get the current user """
         return None
 
+    def resolve_current_user(self, request=None) -> TypeVar('User'):
+        """ Method to get the current user once per request
+
+        The first call runs the full check of current_user() and keeps
+        its result in `request.current_user`; the next calls (views,
+        later handlers) return it without checking the credentials again.
+        """
+        if request is None:
+            return None
+        if getattr(request, 'current_user_resolved', False):
+            return request.current_user
+        request.current_user = self.current_user(request)
+        request.current_user_resolved = True
+        return request.current_user
+
     def session_cookie(self, request=None):
         """
         Get the value of the session cookie from the request.
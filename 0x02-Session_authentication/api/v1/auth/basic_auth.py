@@ -3,11 +3,19 @@
 BasicAuth module
 """
 from api.v1.auth.auth import Auth
+from api.v1.auth.credential_cache import CredentialCache
 import base64
+from os import getenv
 from typing import TypeVar
 from models.user import User
 
 
+CREDENTIAL_CACHE = CredentialCache(
+    int(getenv('BASIC_AUTH_CACHE_SIZE', '1024')),
+    float(getenv('BASIC_AUTH_CACHE_TTL', '300')))
+User.add_listener(lambda event, user: CREDENTIAL_CACHE.invalidate(user.id))
+
+
 class BasicAuth(Auth):
     """ BasicAuth class that inherits from Auth """
 
@@ -113,6 +121,9 @@ class BasicAuth(Auth):
         """
         Retrieves the User instance for a request.
 
+        Headers already verified are looked up in CREDENTIAL_CACHE
+        instead of being decoded and hashed again.
+
         Args:
             request: The request object.
 
@@ -126,6 +137,13 @@ class BasicAuth(Auth):
         if auth_header is None:
             return None
 
+        user_id = CREDENTIAL_CACHE.get(auth_header)
+        if user_id is not None:
+            user = User.get(user_id)
+            if user is not None:
+                return user
+        generation = CREDENTIAL_CACHE.generation
+
         base64_header = self.extract_base64_authorization_header(auth_header)
         if base64_header is None:
             return None
@@ -138,4 +156,7 @@ class BasicAuth(Auth):
         if email is None or password is None:
             return None
 
-        return self.user_object_from_credentials(email, password)
+        user = self.user_object_from_credentials(email, password)
+        if user is not None:
+            CREDENTIAL_CACHE.put(auth_header, user.id, generation)
+        return user
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+CredentialCache module
+"""
+from collections import OrderedDict
+from typing import Optional
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+
+class CredentialCache:
+    """
+    Bounded LRU cache of verified Authorization headers.
+
+    Entries map a keyed digest (HMAC-SHA256 with a per-process random
+    key) of the raw header to the ID of the user it authenticated: the
+    header, hence the password, is never retained.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_size (int): Maximum number of entries (0 disables it).
+            ttl (float): Lifetime of an entry, in seconds.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+        self.__key = os.urandom(32)
+        self.__entries = OrderedDict()
+        self.__by_user = {}
+        self.__lock = threading.Lock()
+
+    def digest(self, authorization_header: str) -> bytes:
+        """
+        Keyed digest of a raw Authorization header.
+        """
+        return hmac.new(self.__key, authorization_header.encode('utf-8'),
+                        hashlib.sha256).digest()
+
+    def get(self, authorization_header: str) -> Optional[str]:
+        """
+        Return the user ID cached for a header, or None.
+        """
+        if self.max_size <= 0 or authorization_header is None:
+            return None
+        key = self.digest(authorization_header)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            user_id, expires_at = entry
+            if expires_at < time.monotonic():
+                self.__discard(key)
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return user_id
+
+    def put(self, authorization_header: str, user_id: str,
+            generation: int = None):
+        """
+        Cache the user ID a header has been verified for.
+
+        Args:
+            authorization_header (str): The verified header.
+            user_id (str): The ID of the authenticated user.
+            generation (int): Value of `generation` read before the
+                verification started: the entry is dropped if users have
+                been invalidated since.
+        """
+        if self.max_size <= 0 or authorization_header is None:
+            return
+        key = self.digest(authorization_header)
+        with self.__lock:
+            if generation is not None and generation != self.generation:
+                return
+            self.__discard(key)
+            self.__entries[key] = (user_id, time.monotonic() + self.ttl)
+            self.__by_user.setdefault(user_id, set()).add(key)
+            while len(self.__entries) > self.max_size:
+                oldest = next(iter(self.__entries))
+                self.__discard(oldest)
+                self.evictions += 1
+
+    def invalidate(self, user_id: str):
+        """
+        Drop every entry of a user (password changed, user removed...).
+        """
+        with self.__lock:
+            self.generation += 1
+            for key in self.__by_user.pop(user_id, ()):
+                self.__entries.pop(key, None)
+
+    def clear(self):
+        """
+        Drop every entry.
+        """
+        with self.__lock:
+            self.generation += 1
+            self.__entries.clear()
+            self.__by_user.clear()
+
+    def stats(self) -> dict:
+        """
+        Counters of the cache.
+        """
+        with self.__lock:
+            return {'size': len(self.__entries), 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+    def __discard(self, key: bytes):
+        """
+        Remove one entry (called with the lock held).
+        """
+        entry = self.__entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self.__by_user.get(entry[0])
+        if keys is not None:
+            keys.discard(key)
+            if len(keys) == 0:
+                del self.__by_user[entry[0]]
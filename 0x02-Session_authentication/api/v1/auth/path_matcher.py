@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+PathMatcher module
+"""
+from typing import Iterable
+
+
+class PathMatcher:
+    """
+    Compiled set of excluded paths.
+
+    Paths are compared with a trailing slash ("/api/v1/status" and
+    "/api/v1/status/" are equivalent). A path ending with "*" excludes
+    every path starting with what precedes the "*".
+
+    Exact paths are kept in a set and wildcard prefixes in a trie, so a
+    match costs O(len(path)) whatever the number of rules.
+    """
+
+    _END = ''
+
+    def __init__(self, excluded_paths: Iterable[str]):
+        """
+        Compile the excluded paths.
+
+        Args:
+            excluded_paths (Iterable[str]): The paths to exclude.
+        """
+        self.exact = set()
+        self.prefixes = {}
+        self.rules = 0
+        for excluded_path in excluded_paths:
+            if excluded_path is None:
+                continue
+            self.rules += 1
+            if excluded_path.endswith('*'):
+                node = self.prefixes
+                for c in excluded_path[:-1]:
+                    node = node.setdefault(c, {})
+                node[self._END] = True
+            else:
+                self.exact.add(self.normalize(excluded_path))
+
+    @staticmethod
+    def normalize(path: str) -> str:
+        """
+        Return the path with a trailing slash.
+        """
+        if not path.endswith('/'):
+            path += '/'
+        return path
+
+    def match(self, path: str) -> bool:
+        """
+        Check if a path is excluded.
+
+        Args:
+            path (str): The path of the request.
+
+        Returns:
+            bool: True if one of the rules matches the path.
+        """
+        path = self.normalize(path)
+        if path in self.exact:
+            return True
+        node = self.prefixes
+        for c in path:
+            if self._END in node:
+                return True
+            node = node.get(c)
+            if node is None:
+                return False
+        return self._END in node
+
+    def __len__(self) -> int:
+        """
+        Number of rules.
+        """
+        return self.rules
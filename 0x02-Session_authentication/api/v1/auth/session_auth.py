@@ -3,15 +3,81 @@
 SessionAuth module
 """
 from api.v1.auth.auth import Auth
+from api.v1.auth.session_expiry import SessionExpiry
+from api.v1.auth.session_store import SessionStore, session_store
+from api.v1.auth.session_token import SessionTokenSigner
+from models.user import User
+from os import getenv
+from typing import List, Tuple, TypeVar
+import time
 import uuid
-from typing import List
 
 
-class SessionAuth:
-    """Class for managing session authentication."""
+class SessionAuth(Auth):
+    """Class for managing session authentication.
+
+    Sessions live in a SessionStore chosen by SESSION_STORE: `memory`
+    (default, `user_id_by_session_id`), `file` or `sqlite`, the last two
+    being shared by all the workers.
+
+    Sessions expire SESSION_DURATION seconds after their creation and
+    SESSION_IDLE_DURATION seconds after their last use (0, the default,
+    for never); a background reaper purges the expired ones.
+
+    With SESSION_MODE=stateless, session IDs are signed tokens (see
+    SessionTokenSigner, keys in SESSION_SECRET_KEYS) verified without any
+    store lookup; they expire after SESSION_DURATION (one day if 0) and
+    can't be destroyed before.
+    """
 
     user_id_by_session_id = {}
 
+    def __init__(self, store: SessionStore = None,
+                 expiry: SessionExpiry = None,
+                 signer: SessionTokenSigner = None):
+        """
+        Initialize the session authentication.
+
+        Args:
+            store (SessionStore): Overrides the store of SESSION_STORE.
+            expiry (SessionExpiry): Overrides the expiration policy of
+                SESSION_DURATION and SESSION_IDLE_DURATION.
+            signer (SessionTokenSigner): Stateless mode with this signer
+                (by default if SESSION_MODE is stateless).
+        """
+        if store is None:
+            store = session_store(sessions=self.user_id_by_session_id)
+        if expiry is None:
+            expiry = SessionExpiry(
+                float(getenv('SESSION_DURATION', '0') or 0),
+                float(getenv('SESSION_IDLE_DURATION', '0') or 0))
+        if signer is None and getenv('SESSION_MODE') == 'stateless':
+            signer = SessionTokenSigner.from_config(
+                getenv('SESSION_SECRET_KEYS', ''),
+                expiry.ttl or 24 * 3600)
+        self.store = store
+        self.expiry = expiry
+        self.signer = signer
+        self.expiry.start(self.store)
+        # a deleted user loses its sessions right away
+        User.add_listener(self.__on_user_event)
+
+    def close(self):
+        """
+        Unregister the user listener and stop the reaper: a SessionAuth
+        that is replaced (tests, app reloads) must be closed not to leak
+        them.
+        """
+        User.remove_listener(self.__on_user_event)
+        self.expiry.stop()
+
+    def __on_user_event(self, event: str, user: User):
+        """
+        Destroy the sessions of a removed user.
+        """
+        if event == 'remove':
+            self.destroy_all_sessions(user.id)
+
     def create_session(self, user_id: str = None) -> str:
         """
         Create a session for a given user ID.
@@ -25,8 +91,13 @@ class SessionAuth:
         """
         if user_id is None or not isinstance(user_id, str):
             return None
+        if self.signer is not None:
+            return self.signer.issue(user_id)
         session_id = str(uuid.uuid4())
-        self.user_id_by_session_id[session_id] = user_id
+        now = time.time()
+        if not self.store.set(session_id, user_id, now):
+            return None
+        self.expiry.schedule(session_id, now, now)
         return session_id
 
     def user_id_for_session_id(self, session_id: str = None) -> str:
@@ -42,30 +113,103 @@ class SessionAuth:
         """
         if session_id is None or not isinstance(session_id, str):
             return None
-        return self.user_id_by_session_id.get(session_id)
-
-    def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
-        """ Method to check if authentication is required """
-        if path is None:
-            return True
-        if excluded_paths is None or len(excluded_paths) == 0:
-            return True
-
-        # Ensure path ends with a slash for comparison
-        if not path.endswith('/'):
-            path += '/'
-
-        for excluded_path in excluded_paths:
-            # Convert the excluded path to a regular expression
-            if excluded_path.endswith('*'):
-                pattern = re.escape(excluded_path[:-1]) + '.*'
-            else:
-                pattern = re.escape(excluded_path) + '/?'
-
-            if re.match(pattern, path):
-                return False
-
-        return True
+        if self.signer is not None:
+            return self.signer.verify(session_id)
+        if not self.expiry.enabled:
+            return self.store.get(session_id)
+
+        record = self.store.record(session_id)
+        if record is None:
+            return None
+        user_id, created_at, last_seen = record
+        now = time.time()
+        if self.expiry.expired(created_at, last_seen, now):
+            if self.store.delete(session_id):
+                self.expiry.expired_on_lookup += 1
+            return None
+        if self.expiry.should_touch(last_seen, now):
+            self.store.touch(session_id, now)
+        # sessions created by other workers get reaped here too
+        self.expiry.schedule(session_id, created_at, last_seen)
+        return user_id
+
+    def current_user(self, request=None) -> TypeVar('User'):
+        """
+        Retrieve the User of the session cookie of a request.
+
+        Args:
+            request: The request object.
+
+        Returns:
+            User: The User instance of a valid session, or None.
+        """
+        user_id = self.user_id_for_session_id(self.session_cookie(request))
+        if user_id is None:
+            return None
+        return User.get(user_id)
+
+    def destroy_all_sessions(self, user_id: str = None) -> int:
+        """
+        Delete all the sessions of a user (account removal, password
+        change), through the reverse index of the store: the cost is in
+        the number of sessions of the user, not of all the sessions.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            int: The number of sessions deleted.
+        """
+        if user_id is None or not isinstance(user_id, str):
+            return 0
+        return self.store.delete_user(user_id)
+
+    def session_stats(self) -> dict:
+        """
+        Metrics of the sessions.
+
+        Returns:
+            dict: Number of stored and scheduled sessions, of sessions
+                reaped in the background and found expired on lookup.
+        """
+        return {'sessions': len(self.store),
+                'scheduled': len(self.expiry),
+                'reaped': self.expiry.reaped,
+                'expired_on_lookup': self.expiry.expired_on_lookup}
+
+    def session_metrics(self) -> List[Tuple[str, str, str, int]]:
+        """
+        The session stats as samples of a Metrics collector (see
+        Metrics.add_collector).
+        """
+        stats = self.session_stats()
+        return [
+            ('sessions', 'gauge', 'Stored sessions.', stats['sessions']),
+            ('sessions_scheduled', 'gauge',
+             'Sessions scheduled in the expiry wheel.', stats['scheduled']),
+            ('sessions_reaped_total', 'counter',
+             'Expired sessions purged by the reaper.', stats['reaped']),
+            ('sessions_expired_on_lookup_total', 'counter',
+             'Sessions found expired when looked up.',
+             stats['expired_on_lookup'])]
+
+    def destroy_session(self, request=None) -> bool:
+        """
+        Delete the session of a request (logout).
+
+        Args:
+            request: The request object.
+
+        Returns:
+            bool: True if the session has been deleted.
+
+        """
+        if request is None:
+            return False
+        session_id = self.session_cookie(request)
+        if session_id is None:
+            return False
+        return self.store.delete(session_id)
 
 
 if __name__ == "__main__":
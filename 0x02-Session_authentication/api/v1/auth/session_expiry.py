@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+SessionExpiry module
+"""
+from typing import Optional
+import heapq
+import threading
+import time
+
+
+class SessionExpiry:
+    """
+    Expiration policy of the sessions and their reaper.
+
+    A session expires `ttl` seconds after its creation and/or `idle_ttl`
+    seconds after its last use (0 disables a limit). Lookups check the
+    deadline of the session they read, in O(1).
+
+    Expired sessions nobody looks up are purged by `reap()` from a timing
+    wheel: sessions are scheduled in the slot of `resolution` seconds of
+    their deadline, and each reap pops the elapsed slots off a heap of
+    the non-empty ones: a reap after a long pause (or of the sessions
+    persisted before a restart) never steps through the empty slots.
+    A session used since it was scheduled is moved to the slot of its
+    new deadline, so each expiry costs O(log slots) amortized.
+    The store is read in full once, by `start()`, to schedule the
+    sessions persisted before a restart.
+    """
+
+    def __init__(self, ttl: float = 0, idle_ttl: float = 0,
+                 resolution: float = 1.0):
+        """
+        Initialize the policy and an empty wheel.
+
+        Args:
+            ttl (float): Absolute lifetime of a session, in seconds.
+            idle_ttl (float): Maximum time between two uses, in seconds.
+            resolution (float): Width of a slot of the wheel, in seconds.
+        """
+        self.ttl = ttl
+        self.idle_ttl = idle_ttl
+        self.resolution = resolution
+        self.reaped = 0
+        self.expired_on_lookup = 0
+        self.__slots = {}
+        self.__heap = []
+        self.__scheduled = set()
+        self.__lock = threading.Lock()
+        self.__thread = None
+        self.__stopped = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        """
+        True if sessions expire at all.
+        """
+        return self.ttl > 0 or self.idle_ttl > 0
+
+    def deadline(self, created_at: float,
+                 last_seen: float) -> Optional[float]:
+        """
+        Time at which a session expires (None if never).
+        """
+        deadlines = []
+        if self.ttl > 0:
+            deadlines.append(created_at + self.ttl)
+        if self.idle_ttl > 0:
+            deadlines.append(last_seen + self.idle_ttl)
+        return min(deadlines) if deadlines else None
+
+    def expired(self, created_at: float, last_seen: float,
+                now: float = None) -> bool:
+        """
+        Check if a session has expired.
+        """
+        deadline = self.deadline(created_at, last_seen)
+        if deadline is None:
+            return False
+        return deadline <= (time.time() if now is None else now)
+
+    def should_touch(self, last_seen: float, now: float) -> bool:
+        """
+        Check if the last use of a session must be written back: only
+        every tenth of `idle_ttl`, not to write on each lookup.
+        """
+        return self.idle_ttl > 0 and now - last_seen >= self.idle_ttl / 10
+
+    def schedule(self, session_id: str, created_at: float,
+                 last_seen: float):
+        """
+        Put a session in the slot of its deadline (once).
+        """
+        deadline = self.deadline(created_at, last_seen)
+        if deadline is None:
+            return
+        with self.__lock:
+            if session_id in self.__scheduled:
+                return
+            self.__push(session_id, deadline)
+
+    def seed(self, store) -> int:
+        """
+        Schedule all the sessions already in `store`: the ones of a
+        durable store from before a restart would never be reaped
+        otherwise.
+
+        Returns:
+            int: The number of sessions newly scheduled.
+        """
+        if not self.enabled:
+            return 0
+        scheduled = len(self)
+        for session_id, _, created_at, last_seen in store.records():
+            self.schedule(session_id, created_at, last_seen)
+        return len(self) - scheduled
+
+    def reap(self, store, now: float = None) -> int:
+        """
+        Delete the sessions of the elapsed slots that have expired.
+
+        Args:
+            store (SessionStore): The store of the sessions.
+            now (float): Current time (time.time() by default).
+
+        Returns:
+            int: The number of sessions deleted.
+        """
+        now = time.time() if now is None else now
+        current = int(now // self.resolution)
+        reaped = 0
+        while True:
+            with self.__lock:
+                # only fully elapsed slots: all their deadlines are past
+                if not self.__heap or self.__heap[0] >= current:
+                    break
+                session_ids = self.__slots.pop(heapq.heappop(self.__heap))
+                for session_id in session_ids:
+                    self.__scheduled.discard(session_id)
+            for session_id in session_ids:
+                record = store.record(session_id)
+                if record is None:
+                    continue
+                _, created_at, last_seen = record
+                deadline = self.deadline(created_at, last_seen)
+                if deadline is None:
+                    continue
+                if deadline <= now:
+                    if store.delete(session_id):
+                        reaped += 1
+                else:
+                    with self.__lock:
+                        self.__push(session_id, deadline)
+        with self.__lock:
+            self.reaped += reaped
+        return reaped
+
+    def start(self, store, interval: float = None):
+        """
+        Schedule the sessions already in `store`, then reap it in a
+        background thread every `interval` seconds (`resolution` by
+        default).
+        """
+        if not self.enabled or self.__thread is not None:
+            return
+        interval = self.resolution if interval is None else interval
+        self.seed(store)
+        stopped = self.__stopped = threading.Event()
+
+        def run():
+            while not stopped.wait(interval):
+                self.reap(store)
+
+        self.__thread = threading.Thread(target=run, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Stop the background reaper (no-op if it isn't running).
+        """
+        thread = self.__thread
+        if thread is None:
+            return
+        self.__stopped.set()
+        thread.join()
+        self.__thread = None
+
+    @property
+    def running(self) -> bool:
+        """
+        True if the background reaper runs.
+        """
+        return self.__thread is not None
+
+    def __len__(self) -> int:
+        """
+        Number of scheduled sessions.
+        """
+        return len(self.__scheduled)
+
+    def __push(self, session_id: str, deadline: float):
+        """
+        Add a session to a slot (called with the lock held).
+        """
+        slot = int(deadline // self.resolution)
+        session_ids = self.__slots.get(slot)
+        if session_ids is None:
+            session_ids = self.__slots[slot] = []
+            heapq.heappush(self.__heap, slot)
+        session_ids.append(session_id)
+        self.__scheduled.add(session_id)
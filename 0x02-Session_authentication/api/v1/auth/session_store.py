@@ -0,0 +1,526 @@
+#!/usr/bin/env python3
+"""
+SessionStore module
+"""
+from os import getenv
+from typing import Iterator, Optional, Set, Tuple
+import fcntl
+import os
+import sqlite3
+import threading
+import time
+
+
+class SessionStore:
+    """
+    Interface of the session stores: session ID -> user ID, with the
+    creation and last use times of the session.
+    """
+
+    def set(self, session_id: str, user_id: str,
+            created_at: float = None) -> bool:
+        """
+        Store a session. Return False if it can't be stored.
+        """
+        raise NotImplementedError
+
+    def record(self, session_id: str) -> Optional[Tuple[str, float, float]]:
+        """
+        Return (user ID, created_at, last_seen) of a session, or None.
+        """
+        raise NotImplementedError
+
+    def touch(self, session_id: str, last_seen: float):
+        """
+        Record the last use of a session.
+        """
+        raise NotImplementedError
+
+    def get(self, session_id: str) -> Optional[str]:
+        """
+        Return the user ID of a session, or None.
+        """
+        record = self.record(session_id)
+        return None if record is None else record[0]
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Remove a session. Return False if it doesn't exist.
+        """
+        raise NotImplementedError
+
+    def sessions_of(self, user_id: str) -> Set[str]:
+        """
+        Return the session IDs of a user, from the reverse index of the
+        store (no scan of the sessions).
+        """
+        raise NotImplementedError
+
+    def delete_user(self, user_id: str) -> int:
+        """
+        Remove all the sessions of a user. Return how many were removed.
+        """
+        return sum(self.delete(session_id)
+                   for session_id in self.sessions_of(user_id))
+
+    def records(self) -> Iterator[Tuple[str, str, float, float]]:
+        """
+        Iterate over (session ID, user ID, created_at, last_seen) of all
+        the sessions (to schedule their expiry after a restart).
+        """
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        """
+        Number of sessions.
+        """
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions in a dict of the process (lost on restart, not shared).
+    `sessions` maps session ID -> user ID, `times` session ID ->
+    [created_at, last_seen] and `by_user` user ID -> set of session IDs
+    (sessions written directly in `sessions` are not in it). Writes hold
+    a lock, so that concurrent ones keep the reverse index consistent.
+    """
+
+    def __init__(self, sessions: dict = None):
+        """
+        Initialize the store on `sessions` (a new dict by default).
+        """
+        self.sessions = {} if sessions is None else sessions
+        self.times = {}
+        self.by_user = {}
+        self.__lock = threading.Lock()
+
+    def set(self, session_id: str, user_id: str,
+            created_at: float = None) -> bool:
+        """
+        Store a session.
+        """
+        created_at = time.time() if created_at is None else created_at
+        with self.__lock:
+            self.__unindex(session_id)
+            self.times[session_id] = [created_at, created_at]
+            self.sessions[session_id] = user_id
+            self.by_user.setdefault(user_id, set()).add(session_id)
+        return True
+
+    def record(self, session_id: str) -> Optional[Tuple[str, float, float]]:
+        """
+        Return (user ID, created_at, last_seen) of a session, or None.
+        """
+        user_id = self.sessions.get(session_id)
+        if user_id is None:
+            return None
+        times = self.times.get(session_id)
+        if times is None:
+            # set directly in `sessions`: consider it created now
+            now = time.time()
+            times = self.times.setdefault(session_id, [now, now])
+        return user_id, times[0], times[1]
+
+    def touch(self, session_id: str, last_seen: float):
+        """
+        Record the last use of a session.
+        """
+        times = self.times.get(session_id)
+        if times is not None:
+            times[1] = last_seen
+
+    def get(self, session_id: str) -> Optional[str]:
+        """
+        Return the user ID of a session, or None.
+        """
+        return self.sessions.get(session_id)
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Remove a session.
+        """
+        with self.__lock:
+            self.__unindex(session_id)
+            self.times.pop(session_id, None)
+            return self.sessions.pop(session_id, None) is not None
+
+    def sessions_of(self, user_id: str) -> Set[str]:
+        """
+        Return the session IDs of a user.
+        """
+        with self.__lock:
+            return set(self.by_user.get(user_id, ()))
+
+    def records(self) -> Iterator[Tuple[str, str, float, float]]:
+        """
+        Iterate over the sessions with their times.
+        """
+        for session_id in list(self.sessions):
+            record = self.record(session_id)
+            if record is not None:
+                yield (session_id,) + record
+
+    def __len__(self) -> int:
+        """
+        Number of sessions.
+        """
+        return len(self.sessions)
+
+    def __unindex(self, session_id: str):
+        """
+        Remove a session from the reverse index (called with the lock
+        held).
+        """
+        user_id = self.sessions.get(session_id)
+        session_ids = self.by_user.get(user_id)
+        if session_ids is not None:
+            session_ids.discard(session_id)
+            if len(session_ids) == 0:
+                del self.by_user[user_id]
+
+
+class FileSessionStore(SessionStore):
+    """
+    Sessions in an append-only file shared by several processes.
+
+    Each mutation appends one line ("S <session> <user> <created_at>",
+    "T <session> <last_seen>" or "D <session>") under an exclusive
+    lock. Each process keeps a dict of the sessions (session ID ->
+    [user ID, created_at, last_seen]), its reverse index (user ID -> set
+    of session IDs) and, before every operation,
+    replays the lines appended since its last read (one fstat when
+    nothing changed). Once dead lines outnumber live sessions the file
+    is rewritten with the live ones; other processes notice the new
+    inode and reload.
+    """
+
+    COMPACT_MIN_LINES = 1024
+
+    def __init__(self, path: str):
+        """
+        Initialize the store on the file `path`.
+        """
+        self.path = path
+        self.sessions = {}
+        self.by_user = {}
+        self.lines = 0
+        self.__fd = None
+        self.__offset = 0
+        self.__tail = b""
+        self.__lock = threading.Lock()
+        self.__lock_fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT,
+                                 0o600)
+
+    def set(self, session_id: str, user_id: str,
+            created_at: float = None) -> bool:
+        """
+        Store a session.
+        """
+        if not self.__valid(session_id) or not self.__valid(user_id):
+            return False
+        created_at = time.time() if created_at is None else created_at
+        self.__append("S\t{}\t{}\t{!r}\n".format(
+            session_id, user_id, created_at))
+        return True
+
+    def record(self, session_id: str) -> Optional[Tuple[str, float, float]]:
+        """
+        Return (user ID, created_at, last_seen) of a session, or None.
+        """
+        with self.__lock:
+            self.__sync()
+            record = self.sessions.get(session_id)
+            return None if record is None else tuple(record)
+
+    def touch(self, session_id: str, last_seen: float):
+        """
+        Record the last use of a session.
+        """
+        if self.record(session_id) is not None:
+            self.__append("T\t{}\t{!r}\n".format(session_id, last_seen))
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Remove a session.
+        """
+        if self.record(session_id) is None:
+            return False
+        self.__append("D\t{}\n".format(session_id))
+        return True
+
+    def sessions_of(self, user_id: str) -> Set[str]:
+        """
+        Return the session IDs of a user.
+        """
+        with self.__lock:
+            self.__sync()
+            return set(self.by_user.get(user_id, ()))
+
+    def delete_user(self, user_id: str) -> int:
+        """
+        Remove all the sessions of a user, in one write.
+        """
+        session_ids = self.sessions_of(user_id)
+        if session_ids:
+            self.__append("".join("D\t{}\n".format(session_id)
+                                  for session_id in session_ids))
+        return len(session_ids)
+
+    def records(self) -> Iterator[Tuple[str, str, float, float]]:
+        """
+        Iterate over the sessions with their times (as of the call).
+        """
+        with self.__lock:
+            self.__sync()
+            records = [(session_id,) + tuple(record)
+                       for session_id, record in self.sessions.items()]
+        return iter(records)
+
+    def __len__(self) -> int:
+        """
+        Number of sessions.
+        """
+        with self.__lock:
+            self.__sync()
+            return len(self.sessions)
+
+    @staticmethod
+    def __valid(value: str) -> bool:
+        """
+        IDs can't contain the separators of the file format.
+        """
+        return (isinstance(value, str) and len(value) > 0 and
+                '\t' not in value and '\n' not in value)
+
+    def __append(self, line: str):
+        """
+        Append one line to the file, compacting it when needed.
+        """
+        with self.__lock:
+            fcntl.flock(self.__lock_fd, fcntl.LOCK_EX)
+            try:
+                self.__sync()
+                os.write(self.__fd, line.encode('utf-8'))
+                self.__sync()
+                if (self.lines > self.COMPACT_MIN_LINES and
+                        self.lines > 2 * len(self.sessions)):
+                    self.__compact()
+            finally:
+                fcntl.flock(self.__lock_fd, fcntl.LOCK_UN)
+
+    def __sync(self):
+        """
+        Replay the lines appended by any process since the last read
+        (called with the thread lock held).
+        """
+        if self.__fd is not None:
+            try:
+                renamed = (os.stat(self.path).st_ino !=
+                           os.fstat(self.__fd).st_ino)
+            except FileNotFoundError:
+                renamed = True
+            if renamed:
+                os.close(self.__fd)
+                self.__fd = None
+        if self.__fd is None:
+            self.__fd = os.open(self.path,
+                                os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+            self.sessions = {}
+            self.by_user = {}
+            self.lines = 0
+            self.__offset = 0
+            self.__tail = b""
+        size = os.fstat(self.__fd).st_size
+        if size <= self.__offset:
+            return
+        data = self.__tail + os.pread(self.__fd, size - self.__offset,
+                                      self.__offset)
+        self.__offset = size
+        end = data.rfind(b"\n") + 1
+        self.__tail = data[end:]
+        for line in data[:end].decode('utf-8').splitlines():
+            fields = line.split('\t')
+            if fields[0] == 'S' and len(fields) == 4:
+                created_at = float(fields[3])
+                self.__unindex(fields[1])
+                self.sessions[fields[1]] = [fields[2], created_at,
+                                            created_at]
+                self.by_user.setdefault(fields[2], set()).add(fields[1])
+            elif fields[0] == 'T' and len(fields) == 3:
+                record = self.sessions.get(fields[1])
+                if record is not None:
+                    record[2] = float(fields[2])
+            elif fields[0] == 'D' and len(fields) == 2:
+                self.__unindex(fields[1])
+                self.sessions.pop(fields[1], None)
+            self.lines += 1
+
+    def __unindex(self, session_id: str):
+        """
+        Remove a session from the reverse index (called with the thread
+        lock held).
+        """
+        record = self.sessions.get(session_id)
+        if record is None:
+            return
+        session_ids = self.by_user.get(record[0])
+        if session_ids is not None:
+            session_ids.discard(session_id)
+            if len(session_ids) == 0:
+                del self.by_user[record[0]]
+
+    def __compact(self):
+        """
+        Rewrite the file with the live sessions only (called with both
+        locks held).
+        """
+        tmp_path = "{}.tmp".format(self.path)
+        with open(tmp_path, 'w') as f:
+            for session_id, record in self.sessions.items():
+                user_id, created_at, last_seen = record
+                f.write("S\t{}\t{}\t{!r}\n".format(
+                    session_id, user_id, created_at))
+                if last_seen != created_at:
+                    f.write("T\t{}\t{!r}\n".format(session_id, last_seen))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.__sync()
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in a SQLite database in WAL mode: readers of any process
+    don't block each other nor the writer. An index on user_id serves
+    the sessions of a user.
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        """
+        Initialize the store on the database file `path`.
+        """
+        self.path = path
+        self.timeout = timeout
+        self.__local = threading.local()
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                           "session_id TEXT PRIMARY KEY, "
+                           "user_id TEXT NOT NULL, "
+                           "created_at REAL NOT NULL DEFAULT 0, "
+                           "last_seen REAL NOT NULL DEFAULT 0) "
+                           "WITHOUT ROWID")
+        columns = [row[1] for row in
+                   connection.execute("PRAGMA table_info(sessions)")]
+        for column in ('created_at', 'last_seen'):
+            if column not in columns:
+                connection.execute("ALTER TABLE sessions ADD COLUMN {} "
+                                   "REAL NOT NULL DEFAULT 0".format(column))
+        connection.execute("CREATE INDEX IF NOT EXISTS sessions_user_id "
+                           "ON sessions (user_id)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Connection of the current thread.
+        """
+        connection = getattr(self.__local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout,
+                                         isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.__local.connection = connection
+        return connection
+
+    def set(self, session_id: str, user_id: str,
+            created_at: float = None) -> bool:
+        """
+        Store a session.
+        """
+        created_at = time.time() if created_at is None else created_at
+        self._connection().execute(
+            "INSERT OR REPLACE INTO sessions "
+            "(session_id, user_id, created_at, last_seen) "
+            "VALUES (?, ?, ?, ?)", (session_id, user_id, created_at,
+                                    created_at))
+        return True
+
+    def record(self, session_id: str) -> Optional[Tuple[str, float, float]]:
+        """
+        Return (user ID, created_at, last_seen) of a session, or None.
+        """
+        row = self._connection().execute(
+            "SELECT user_id, created_at, last_seen FROM sessions "
+            "WHERE session_id = ?", (session_id,)).fetchone()
+        return None if row is None else tuple(row)
+
+    def touch(self, session_id: str, last_seen: float):
+        """
+        Record the last use of a session.
+        """
+        self._connection().execute(
+            "UPDATE sessions SET last_seen = ? WHERE session_id = ?",
+            (last_seen, session_id))
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Remove a session.
+        """
+        cursor = self._connection().execute(
+            "DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        return cursor.rowcount > 0
+
+    def sessions_of(self, user_id: str) -> Set[str]:
+        """
+        Return the session IDs of a user.
+        """
+        return {row[0] for row in self._connection().execute(
+            "SELECT session_id FROM sessions WHERE user_id = ?",
+            (user_id,))}
+
+    def delete_user(self, user_id: str) -> int:
+        """
+        Remove all the sessions of a user, in one statement.
+        """
+        cursor = self._connection().execute(
+            "DELETE FROM sessions WHERE user_id = ?", (user_id,))
+        return cursor.rowcount
+
+    def records(self) -> Iterator[Tuple[str, str, float, float]]:
+        """
+        Iterate over the sessions with their times.
+        """
+        return iter(self._connection().execute(
+            "SELECT session_id, user_id, created_at, last_seen "
+            "FROM sessions").fetchall())
+
+    def __len__(self) -> int:
+        """
+        Number of sessions.
+        """
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def session_store(kind: str = None, path: str = None,
+                  sessions: dict = None) -> SessionStore:
+    """
+    Build the session store selected by SESSION_STORE (memory, file or
+    sqlite) and SESSION_STORE_PATH.
+
+    Args:
+        kind (str): Overrides SESSION_STORE.
+        path (str): Overrides SESSION_STORE_PATH.
+        sessions (dict): Dict backing the memory store.
+
+    Returns:
+        SessionStore: The session store.
+    """
+    kind = kind or getenv('SESSION_STORE', 'memory')
+    if kind == 'file':
+        return FileSessionStore(
+            path or getenv('SESSION_STORE_PATH', '.sessions'))
+    if kind == 'sqlite':
+        return SQLiteSessionStore(
+            path or getenv('SESSION_STORE_PATH', '.sessions.db'))
+    return MemorySessionStore(sessions)
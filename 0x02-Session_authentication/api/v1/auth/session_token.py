@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+SessionToken module
+"""
+from typing import Dict, Optional
+import base64
+import binascii
+import hmac
+import time
+
+
+class SessionTokenSigner:
+    """
+    Stateless session tokens: the token carries the user ID, its issue
+    and expiry times and an HMAC-SHA256 of them, so verifying it needs
+    no session store.
+
+    Token: "<key ID>.<base64url user ID>.<issued at>.<expires at>.<MAC>".
+    Several keys can be active at once for rotation: tokens are signed
+    with the first one and verified with the one named by their key ID.
+    A token can't be revoked before it expires.
+    """
+
+    def __init__(self, keys: Dict[str, str], ttl: float):
+        """
+        Initialize the signer.
+
+        Args:
+            keys (dict): Key ID -> secret, the first one signs.
+            ttl (float): Lifetime of a token, in seconds.
+        """
+        if not keys:
+            raise ValueError("at least one key is needed")
+        for key_id in keys:
+            if not key_id or '.' in key_id:
+                raise ValueError("invalid key ID: {!r}".format(key_id))
+        self.keys = {key_id: secret.encode('utf-8')
+                     for key_id, secret in keys.items()}
+        self.key_id = next(iter(self.keys))
+        self.ttl = ttl
+
+    @classmethod
+    def from_config(cls, config: str, ttl: float) -> 'SessionTokenSigner':
+        """
+        Build a signer from "id1:secret1,id2:secret2" (the format of
+        SESSION_SECRET_KEYS).
+        """
+        keys = {}
+        for item in config.split(','):
+            key_id, _, secret = item.strip().partition(':')
+            if not secret:
+                raise ValueError("keys must be given as id:secret")
+            keys[key_id] = secret
+        return cls(keys, ttl)
+
+    def issue(self, user_id: str, now: float = None) -> str:
+        """
+        Create the token of a user.
+        """
+        issued_at = int(time.time() if now is None else now)
+        payload = "{}.{}.{}.{}".format(
+            self.key_id, self.__encode(user_id.encode('utf-8')),
+            issued_at, issued_at + int(self.ttl))
+        return "{}.{}".format(payload, self.__mac(self.key_id, payload))
+
+    def verify(self, token: str, now: float = None) -> Optional[str]:
+        """
+        Return the user ID of a valid, unexpired token, or None.
+        """
+        if not isinstance(token, str):
+            return None
+        payload, _, mac = token.rpartition('.')
+        fields = payload.split('.')
+        if len(fields) != 4 or fields[0] not in self.keys:
+            return None
+        try:
+            if not hmac.compare_digest(
+                    self.__mac(fields[0], payload).encode('ascii'),
+                    mac.encode('utf-8', 'surrogatepass')):
+                return None
+            # signed by us: the fields are well formed
+            if int(fields[3]) <= (time.time() if now is None else now):
+                return None
+            return self.__decode(fields[1]).decode('utf-8')
+        except (ValueError, UnicodeError, binascii.Error):
+            return None
+
+    def __mac(self, key_id: str, payload: str) -> str:
+        """
+        MAC of a payload with a key.
+        """
+        return self.__encode(hmac.digest(
+            self.keys[key_id], payload.encode('utf-8', 'surrogatepass'),
+            'sha256'))
+
+    @staticmethod
+    def __encode(data: bytes) -> str:
+        """
+        Unpadded base64url.
+        """
+        return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+    @staticmethod
+    def __decode(data: str) -> bytes:
+        """
+        Decode unpadded base64url.
+        """
+        return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
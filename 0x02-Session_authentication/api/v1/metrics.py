@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Metrics module
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+import threading
+
+# upper bounds of the latency buckets, in seconds (plus +Inf)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# the stages of a request are much shorter: finer buckets from 1us
+STAGE_BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025,
+                 0.00005) + BUCKETS
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Metrics:
+    """
+    Request counts by endpoint, method and status, latency histograms by
+    endpoint and method, and duration histograms of named stages (see
+    api.v1.auth.stage_timers).
+
+    Each thread records into its own shard without any lock; shards are
+    merged when the metrics are read. The shards of finished threads
+    (one thread per request with the threaded server) are folded into a
+    common total whenever a new thread registers its shard, so there are
+    never more shards than live threads, scraped or not.
+
+    Values kept elsewhere (sizes, counters of other components) are
+    published by collectors: callables run at each render, returning
+    (name, type, help, value) samples.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS,
+                 stage_buckets: Tuple[float, ...] = STAGE_BUCKETS):
+        """
+        Initialize empty metrics.
+
+        Args:
+            buckets (tuple): Upper bounds of the latency buckets.
+            stage_buckets (tuple): Upper bounds of the stage buckets.
+        """
+        self.buckets = tuple(buckets)
+        self.stage_buckets = tuple(stage_buckets)
+        self.__local = threading.local()
+        self.__shards = []
+        self.__retired = ({}, {}, {})
+        self.__collectors = []
+        self.__lock = threading.Lock()
+
+    def observe(self, endpoint: str, method: str, status: int,
+                seconds: float):
+        """
+        Record one request.
+        """
+        statuses, histograms, _ = self.__shard()
+        key = (endpoint, method, status)
+        statuses[key] = statuses.get(key, 0) + 1
+        histogram = histograms.get((endpoint, method))
+        if histogram is None:
+            histogram = histograms[(endpoint, method)] = \
+                [[0] * (len(self.buckets) + 1), 0.0]
+        histogram[0][bisect_left(self.buckets, seconds)] += 1
+        histogram[1] += seconds
+
+    def observe_stage(self, stage: str, seconds: float):
+        """
+        Record one run of a stage.
+        """
+        stages = self.__shard()[2]
+        histogram = stages.get(stage)
+        if histogram is None:
+            histogram = stages[stage] = \
+                [[0] * (len(self.stage_buckets) + 1), 0.0]
+        histogram[0][bisect_left(self.stage_buckets, seconds)] += 1
+        histogram[1] += seconds
+
+    def snapshot(self) -> Tuple[Dict[tuple, int], Dict[tuple, list],
+                                Dict[str, list]]:
+        """
+        Merge the shards of all the threads.
+
+        Returns:
+            tuple: (endpoint, method, status) -> count,
+                (endpoint, method) -> [bucket counts, sum of latencies],
+                and stage -> [bucket counts, sum of durations].
+        """
+        with self.__lock:
+            self.__retire_dead()
+            total = ({}, {}, {})
+            self.__merge(total, self.__retired)
+            for _, shard in self.__shards:
+                self.__merge(total, shard)
+        return total
+
+    def shard_count(self) -> int:
+        """
+        Number of registered shards (at most one per live thread, plus
+        the ones of threads that ended since the last registration).
+        """
+        with self.__lock:
+            return len(self.__shards)
+
+    def add_collector(self, collector: Callable[
+            [], Iterable[Tuple[str, str, str, float]]]):
+        """
+        Render the samples of a collector with the metrics.
+
+        Args:
+            collector (callable): Returns (name, type, help, value)
+                samples, type being 'gauge' or 'counter'.
+        """
+        with self.__lock:
+            self.__collectors.append(collector)
+
+    def remove_collector(self, collector: Callable):
+        """
+        Stop rendering the samples of a collector (no-op if unknown).
+        """
+        with self.__lock:
+            if collector in self.__collectors:
+                self.__collectors.remove(collector)
+
+    def __retire_dead(self):
+        """
+        Fold the shards of finished threads into the retired total
+        (called with the lock held).
+        """
+        alive = []
+        for thread, shard in self.__shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self.__merge(self.__retired, shard)
+        self.__shards = alive
+
+    def quantile(self, counts: List[int], q: float,
+                 buckets: Tuple[float, ...] = None) -> float:
+        """
+        Estimate a quantile from bucket counts, interpolating linearly
+        inside its bucket (the latency buckets by default).
+        """
+        buckets = self.buckets if buckets is None else buckets
+        total = sum(counts)
+        if total == 0:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                if i == len(buckets):
+                    return buckets[-1]
+                lower = buckets[i - 1] if i > 0 else 0.0
+                return lower + (buckets[i] - lower) * \
+                    (rank - cumulative) / count
+            cumulative += count
+        return buckets[-1]
+
+    def render(self) -> str:
+        """
+        The metrics in the Prometheus text exposition format.
+        """
+        statuses, histograms, stages = self.snapshot()
+        lines = ["# HELP http_requests_total Requests by endpoint, method "
+                 "and status.",
+                 "# TYPE http_requests_total counter"]
+        for (endpoint, method, status), count in sorted(statuses.items()):
+            lines.append('http_requests_total{{endpoint="{}",method="{}",'
+                         'status="{}"}} {}'.format(
+                             self.__escape(endpoint), method, status, count))
+        lines += self.__histograms(
+            'http_request_duration_seconds', 'Request latency.', 'Latency',
+            self.buckets,
+            {'endpoint="{}",method="{}"'.format(self.__escape(endpoint),
+                                                method): histogram
+             for (endpoint, method), histogram in histograms.items()})
+        if stages:
+            lines += self.__histograms(
+                'auth_stage_duration_seconds',
+                'Duration of the stages of the authentication.',
+                'Stage duration', self.stage_buckets,
+                {'stage="{}"'.format(self.__escape(stage)): histogram
+                 for stage, histogram in stages.items()})
+        with self.__lock:
+            collectors = list(self.__collectors)
+        for collector in collectors:
+            for name, kind, help_text, value in collector():
+                lines += ["# HELP {} {}".format(name, help_text),
+                          "# TYPE {} {}".format(name, kind),
+                          "{} {}".format(name, value)]
+        return "\n".join(lines) + "\n"
+
+    def __histograms(self, name: str, help_text: str, measure: str,
+                     buckets: Tuple[float, ...],
+                     histograms: Dict[str, list]) -> List[str]:
+        """
+        Lines of a histogram family "<x>_seconds" (by label string) and
+        of its quantiles gauge "<x>_quantile_seconds".
+        """
+        quantile_name = name[:-len('_seconds')] + '_quantile_seconds'
+        lines = ["# HELP {} {}".format(name, help_text),
+                 "# TYPE {} histogram".format(name)]
+        quantiles = []
+        for labels, (counts, total) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(
+                    name, labels,
+                    '+Inf' if bound == float('inf') else repr(bound),
+                    cumulative))
+            lines.append('{}_sum{{{}}} {!r}'.format(name, labels, total))
+            lines.append('{}_count{{{}}} {}'.format(name, labels,
+                                                    cumulative))
+            for q in QUANTILES:
+                quantiles.append('{}{{{},quantile="{}"}} {:.6f}'.format(
+                    quantile_name, labels, q,
+                    self.quantile(counts, q, buckets)))
+        lines += ["# HELP {} {} quantiles estimated from the histogram "
+                  "buckets.".format(quantile_name, measure),
+                  "# TYPE {} gauge".format(quantile_name)]
+        return lines + quantiles
+
+    @staticmethod
+    def __merge(total: tuple, shard: tuple):
+        """
+        Add the counters of a shard to `total` (called with the lock
+        held; the thread of the shard may still be writing to it).
+        """
+        statuses = total[0]
+        for key, count in list(shard[0].items()):
+            statuses[key] = statuses.get(key, 0) + count
+        for histograms, shard_histograms in zip(total[1:], shard[1:]):
+            for key, (counts, seconds) in list(shard_histograms.items()):
+                histogram = histograms.get(key)
+                if histogram is None:
+                    histograms[key] = [list(counts), seconds]
+                else:
+                    histogram[0] = [a + b for a, b in
+                                    zip(histogram[0], counts)]
+                    histogram[1] += seconds
+
+    def __shard(self) -> tuple:
+        """
+        Counters of the current thread, registered on first use.
+        """
+        shard = getattr(self.__local, 'shard', None)
+        if shard is None:
+            shard = self.__local.shard = ({}, {}, {})
+            with self.__lock:
+                self.__retire_dead()
+                self.__shards.append((threading.current_thread(), shard))
+        return shard
+
+    @staticmethod
+    def __escape(value: str) -> str:
+        """
+        Escape a label value.
+        """
+        return value.replace('\\', '\\\\').replace('"', '\\"') \
+            .replace('\n', '\\n')
+
+
+METRICS = Metrics()
@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 """ Module of Index views
 """
-from flask import jsonify, abort
+from flask import Response, jsonify, abort
 from api.v1.views import app_views
+from api.v1.metrics import METRICS
 
 
 @app_views.route('/status', methods=['GET'], strict_slashes=False)
@@ -26,6 +27,16 @@ def stats() -> str:
     return jsonify(stats)
 
 
+@app_views.route('/metrics', methods=['GET'], strict_slashes=False)
+def metrics() -> str:
+    """ GET /api/v1/metrics
+    Return:
+      - request counts and latencies, in the Prometheus text format
+    """
+    return Response(METRICS.render(),
+                    content_type='text/plain; version=0.0.4')
+
+
 @app_views.route('/unauthorized/', methods=['GET'], strict_slashes=False)
 def unauthorized() -> str:
     """ GET /api/v1/unauthorized
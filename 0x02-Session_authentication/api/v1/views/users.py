@@ -2,18 +2,80 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import Response, abort, jsonify, request
 from models.user import User
+import base64
+import binascii
+import json
+
+
+PAGE_MAX_LIMIT = 1000
+
+
+def encode_cursor(user_id: str) -> str:
+    """ Opaque pagination cursor pointing right after `user_id`
+    """
+    return base64.urlsafe_b64encode(user_id.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> str:
+    """ User ID of a pagination cursor, None if invalid
+    """
+    try:
+        user_id = base64.b64decode(cursor.encode(), altchars=b'-_',
+                                   validate=True).decode()
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+    return user_id if len(user_id) > 0 else None
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - limit: page size (1 to PAGE_MAX_LIMIT)
+      - cursor: `next_cursor` of the previous page
+      - format: `ndjson` to stream one User per line
     Return:
-      - list of all User objects JSON represented
+      - list of all User objects JSON represented, streamed
+      - with `limit`/`cursor`: {"users": [...], "next_cursor": ...},
+        `next_cursor` being null on the last page
+      - 400 if `limit` or `cursor` is invalid
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    if limit is not None or cursor is not None:
+        try:
+            limit = int(limit) if limit is not None else 100
+        except ValueError:
+            limit = 0
+        if limit < 1 or limit > PAGE_MAX_LIMIT:
+            return jsonify({'error': "Wrong limit"}), 400
+        after = None
+        if cursor is not None:
+            after = decode_cursor(cursor)
+            if after is None:
+                return jsonify({'error': "Wrong cursor"}), 400
+        users = User.page(after, limit)
+        next_cursor = None
+        if len(users) == limit:
+            next_cursor = encode_cursor(users[-1].id)
+        return jsonify({'users': [user.to_json() for user in users],
+                        'next_cursor': next_cursor})
+
+    if request.args.get('format') == 'ndjson':
+        def ndjson():
+            for user in User.iterate():
+                yield json.dumps(user.to_json()) + "\n"
+        return Response(ndjson(), mimetype='application/x-ndjson')
+
+    def json_array():
+        sep = "["
+        for user in User.iterate():
+            yield sep + json.dumps(user.to_json())
+            sep = ","
+        yield "[]" if sep == "[" else "]"
+    return Response(json_array(), mimetype='application/json')
 
 
 @app_views.route('/users/me', methods=['GET'], strict_slashes=False)
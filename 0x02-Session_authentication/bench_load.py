@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+""" Startup benchmark: time and peak RSS of User.load_from_file()
+
+Usage: ./bench_load.py [number of users]
+
+Compares the eager loader (json.load + one User per record) with the
+streaming, lazily hydrated one, each in a fresh process.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+
+
+LOADERS = {
+    'eager': """
+import json
+from models.base import DATA
+from models.user import User
+with open('.db_User.json') as f:
+    objs_json = json.load(f)
+DATA['User'] = {}
+for obj_id, obj_json in objs_json.items():
+    DATA['User'][obj_id] = User(**obj_json)
+""",
+    'lazy': """
+from models.user import User
+User.load_from_file()
+""",
+}
+
+CHILD = """
+import resource, time
+from models.user import User
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+{}
+elapsed = time.perf_counter() - start
+first = time.perf_counter()
+User.search({{'email': 'user{}@hbtn.io'}})
+first = time.perf_counter() - first
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+print(User.count(), elapsed, first, peak)
+"""
+
+
+def generate(file_path: str, n: int):
+    """ Write a .db_User.json with `n` users
+    """
+    with open(file_path, 'w') as f:
+        f.write("{")
+        for i in range(n):
+            user_id = str(uuid.uuid4())
+            user = {
+                "id": user_id,
+                "created_at": "2024-06-07T02:12:09",
+                "updated_at": "2024-06-07T02:12:09",
+                "email": "user{}@hbtn.io".format(i),
+                "_password": uuid.uuid4().hex + uuid.uuid4().hex,
+                "first_name": "Bob",
+                "last_name": "Dylan {}".format(i),
+            }
+            f.write("{}{}: {}".format(", " if i else "",
+                                      json.dumps(user_id), json.dumps(user)))
+        f.write("}")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=here)
+    with tempfile.TemporaryDirectory() as tmp:
+        generate(os.path.join(tmp, ".db_User.json"), n)
+        size = os.path.getsize(os.path.join(tmp, ".db_User.json"))
+        print("{} users, {:.1f} MB file".format(n, size / 1e6))
+        for name, loader in LOADERS.items():
+            out = subprocess.check_output(
+                [sys.executable, "-c", CHILD.format(loader, n // 2)],
+                cwd=tmp, env=env).decode().split()
+            count, elapsed, first, peak_kb = (int(out[0]), float(out[1]),
+                                              float(out[2]), int(out[3]))
+            scale = 100000 / count
+            print("{:>6}: load {:.3f}s, first search {:.3f}s, peak RSS "
+                  "+{:.1f} MB  (per 100k users: {:.3f}s, {:.1f} MB)"
+                  .format(name, elapsed, first, peak_kb / 1024,
+                          elapsed * scale, peak_kb / 1024 * scale))
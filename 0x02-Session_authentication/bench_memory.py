@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+""" Memory benchmark: per-user cost of the __dict__ and __slots__ layouts
+
+Usage: ./bench_memory.py [number of users]
+
+Builds the users in a fresh process per layout and reports the RSS
+growth of users as loaded from a file. `dict` replays the former User
+layout (one __dict__ per instance), `slots` is models.user.User.
+"""
+import os
+import subprocess
+import sys
+
+
+CHILD = """
+import resource, uuid
+from datetime import datetime
+from models.user import User
+
+
+class DictUser():
+    def __init__(self, **kwargs):
+        self.id = kwargs.get('id')
+        self.created_at = datetime.strptime(kwargs.get('created_at'),
+                                            "%Y-%m-%dT%H:%M:%S")
+        self.updated_at = datetime.strptime(kwargs.get('updated_at'),
+                                            "%Y-%m-%dT%H:%M:%S")
+        self.email = kwargs.get('email')
+        self._password = kwargs.get('_password')
+        self.first_name = kwargs.get('first_name')
+        self.last_name = kwargs.get('last_name')
+
+
+cls = {{'dict': DictUser, 'slots': User}}['{}']
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+users = []
+for i in range({}):
+    users.append(cls(id=str(uuid.uuid4()), email='user%d@hbtn.io' % i,
+                     created_at='2024-06-07T02:12:09',
+                     updated_at='2024-06-07T02:12:09',
+                     _password=uuid.uuid4().hex + uuid.uuid4().hex,
+                     first_name='Bob', last_name='Dylan %d' % i))
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss)
+"""
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=here)
+    results = {}
+    for layout in ('dict', 'slots'):
+        out = subprocess.check_output(
+            [sys.executable, "-c", CHILD.format(layout, n)], env=env)
+        results[layout] = int(out) * 1024
+        print("{:>5}: +{:.1f} MB for {} users ({:.0f} bytes/user)".format(
+            layout, results[layout] / 1e6, n, results[layout] / n))
+    print("saved: {:.0%}".format(1 - results['slots'] / results['dict']))
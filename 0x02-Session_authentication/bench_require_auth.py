@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+""" Micro-benchmark of the excluded paths matching of require_auth
+
+Usage: ./bench_require_auth.py
+
+Compares, for 10, 100 and 1000 rules, the former per-request regex loop
+with a PathMatcher compiled once.
+"""
+import re
+import timeit
+from api.v1.auth.path_matcher import PathMatcher
+
+
+def regex_loop(path, excluded_paths):
+    """ Former Auth.require_auth: one regex per rule and per call """
+    if not path.endswith('/'):
+        path += '/'
+    for excluded_path in excluded_paths:
+        if excluded_path.endswith('*'):
+            pattern = re.escape(excluded_path[:-1]) + '.*'
+        else:
+            pattern = re.escape(excluded_path) + '/?'
+        if re.match(pattern, path):
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    path = "/api/v1/users/me"
+    for n in (10, 100, 1000):
+        rules = ["/api/v1/public_{}/".format(i) for i in range(n - n // 10)]
+        rules += ["/api/v1/static_{}*".format(i) for i in range(n // 10)]
+        matcher = PathMatcher(rules)
+        number = max(100, 100000 // n)
+        old = timeit.timeit(lambda: regex_loop(path, rules), number=number)
+        new = timeit.timeit(lambda: not matcher.match(path), number=100000)
+        print("{:>5} rules: regex loop {:8.2f} us/request, "
+              "PathMatcher {:.2f} us/request".format(
+                  n, old / number * 1e6, new / 100000 * 1e6))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+""" Benchmark of the session stores: lookups/sec under multi-process load
+
+Usage: ./bench_session_store.py [processes] [sessions] [seconds]
+
+Each worker process opens the store and looks up random existing
+sessions for a fixed time. The memory store can't be shared: its figure
+is per process, for reference.
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from api.v1.auth.session_store import session_store
+
+
+def worker(kind, path, session_ids, seconds, results):
+    """ Look up random sessions for `seconds`, report the count """
+    store = session_store(kind, path)
+    if kind == 'memory':
+        for session_id in session_ids:
+            store.set(session_id, "user")
+    rand = random.Random(os.getpid())
+    count = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for _ in range(100):
+            assert store.get(rand.choice(session_ids)) is not None
+        count += 100
+    results.put(count)
+
+
+if __name__ == "__main__":
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 3.0
+    session_ids = [str(uuid.uuid4()) for _ in range(sessions)]
+    print("{} processes, {} sessions, {}s".format(processes, sessions,
+                                                  seconds))
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in ('memory', 'file', 'sqlite'):
+            path = os.path.join(tmp, kind)
+            store = session_store(kind, path)
+            if kind != 'memory':
+                for session_id in session_ids:
+                    store.set(session_id, "user")
+            results = multiprocessing.Queue()
+            workers = [multiprocessing.Process(
+                target=worker,
+                args=(kind, path, session_ids, seconds, results))
+                for _ in range(processes)]
+            for process in workers:
+                process.start()
+            total = sum(results.get() for _ in workers)
+            for process in workers:
+                process.join()
+            print("{:>7}: {:10.0f} lookups/sec".format(kind,
+                                                       total / seconds))
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+""" Benchmark of session verification: signed token vs store lookups
+
+Usage: ./bench_session_token.py [sessions] [lookups]
+
+Times SessionAuth.user_id_for_session_id on random valid sessions in
+stateless mode (HMAC check, no store) and with the memory (dict), file
+and sqlite stores.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from api.v1.auth.session_auth import SessionAuth
+from api.v1.auth.session_store import session_store
+from api.v1.auth.session_token import SessionTokenSigner
+
+
+def timed(auth, session_ids, lookups):
+    """ Return the mean verification time in microseconds """
+    sample = [random.choice(session_ids) for _ in range(lookups)]
+    start = time.perf_counter()
+    for session_id in sample:
+        assert auth.user_id_for_session_id(session_id) is not None
+    return (time.perf_counter() - start) / lookups * 1e6
+
+
+if __name__ == "__main__":
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    print("{} sessions, {} lookups".format(sessions, lookups))
+    with tempfile.TemporaryDirectory() as tmp:
+        signer = SessionTokenSigner({'k2': 'new secret', 'k1': 'old'}, 3600)
+        auths = [('stateless', SessionAuth(signer=signer))]
+        for kind in ('memory', 'file', 'sqlite'):
+            store = session_store(kind, os.path.join(tmp, kind), {})
+            auths.append((kind, SessionAuth(store=store)))
+        for name, auth in auths:
+            session_ids = [auth.create_session("user{}".format(i))
+                           for i in range(sessions)]
+            print("{:>9}: {:6.2f} us/verify".format(
+                name, timed(auth, session_ids, lookups)))
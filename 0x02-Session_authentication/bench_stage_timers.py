@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+""" Benchmark of the cost of the authentication stage timers
+
+Usage: ./bench_stage_timers.py [users] [checks]
+
+Times BasicAuth.current_user (credential cache off) and
+SessionAuth.current_user with the timers never enabled, enabled, then
+disabled again: the last run must cost the same as the first.
+"""
+import base64
+import os
+import sys
+import tempfile
+import time
+
+os.environ['BASIC_AUTH_CACHE_SIZE'] = '0'
+os.chdir(tempfile.mkdtemp())
+
+from api.v1.auth.basic_auth import BasicAuth  # noqa: E402
+from api.v1.auth.session_auth import SessionAuth  # noqa: E402
+from api.v1.auth.stage_timers import STAGE_TIMERS  # noqa: E402
+from models.user import User  # noqa: E402
+
+
+class FakeRequest:
+    """ The headers and cookies of a request """
+
+    def __init__(self, headers=None, cookies=None):
+        self.headers = headers or {}
+        self.cookies = cookies or {}
+
+
+def timed(auth, requests):
+    """ Return the mean current_user time in microseconds """
+    start = time.perf_counter()
+    for request in requests:
+        assert auth.current_user(request) is not None
+    return (time.perf_counter() - start) / len(requests) * 1e6
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    checks = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    basic, session = BasicAuth(), SessionAuth()
+    basic_requests, session_requests = [], []
+    for i in range(users):
+        user = User(email="user{}@example.com".format(i))
+        user.password = "pwd{}".format(i)
+        user.save()
+        credentials = "{}:pwd{}".format(user.email, i).encode()
+        basic_requests.append(FakeRequest(headers={
+            'Authorization': 'Basic ' + base64.b64encode(credentials).decode()
+        }))
+        session_requests.append(FakeRequest(cookies={
+            os.getenv('SESSION_NAME', '_my_session_id'):
+            session.create_session(user.id)}))
+    basic_requests = (basic_requests * (checks // users + 1))[:checks]
+    session_requests = (session_requests * (checks // users + 1))[:checks]
+
+    print("{} users, {} checks".format(users, checks))
+    for state in ('never enabled', 'enabled', 'disabled'):
+        STAGE_TIMERS.set_enabled(state == 'enabled')
+        print("{:>13}: basic {:6.2f} us, session {:6.2f} us".format(
+            state, timed(basic, basic_requests),
+            timed(session, session_requests)))
@@ -2,20 +2,105 @@
 """ Base module
 """
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
+from typing import (TypeVar, Callable, List, Iterable, Optional, Set,
+                    Tuple)
+from models import storage
+import bisect
 import json
+import threading
 import uuid
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+INDEXES = {}
+ORDERS = {}
+ORDERS_LOCK = threading.Lock()
+LISTENERS = {}
+
+
+def parse_timestamp(value: str) -> datetime:
+    """ Parse a TIMESTAMP_FORMAT string, through the C fixed-format
+    parser when possible (much faster than strptime)
+    """
+    if len(value) == 19 and value[10] == 'T':
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+class Index():
+    """ Hash index of the objects of one class on a few attributes
+    """
+
+    def __init__(self, fields: Tuple[str, ...]):
+        """ Initialize an empty index on `fields`
+        """
+        self.fields = tuple(fields)
+        self.entries = {field: {} for field in self.fields}
+        self.keys = {}
+
+    def add(self, obj_id: str, values: Tuple):
+        """ Index the object `obj_id` with its current `values`
+        (one per field, in the order of `fields`)
+        """
+        self.discard(obj_id)
+        self.keys[obj_id] = values
+        for field, value in zip(self.fields, values):
+            try:
+                self.entries[field].setdefault(value, set()).add(obj_id)
+            except TypeError:
+                continue
+
+    def discard(self, obj_id: str):
+        """ Remove the object `obj_id` from the index
+        """
+        values = self.keys.pop(obj_id, None)
+        if values is None:
+            return
+        for field, value in zip(self.fields, values):
+            try:
+                ids = self.entries[field].get(value)
+            except TypeError:
+                continue
+            if ids is None:
+                continue
+            ids.discard(obj_id)
+            if len(ids) == 0:
+                del self.entries[field][value]
+
+    def lookup(self, field: str, value) -> Optional[Set[str]]:
+        """ Return the IDs indexed under `field` == `value`, or None if
+        the index can't answer (field not indexed, unhashable value)
+        """
+        entries = self.entries.get(field)
+        if entries is None:
+            return None
+        try:
+            return entries.get(value, set())
+        except TypeError:
+            return None
 
 
 class Base():
     """ Base class
+
+    Subclasses can declare `indexed_fields`: `search()` on those
+    attributes is answered from a hash index instead of a full scan.
+    The index reflects the objects as of their last `save()`.
+
+    `load_from_file()` keeps the records as raw JSON in `DATA`: an
+    object is only built the first time `get()`/`search()` returns it.
+
+    Attributes live in `__slots__` (no per-instance `__dict__`): a
+    subclass lists its own attributes in its `__slots__`.
     """
 
+    __slots__ = ('id', 'created_at', 'updated_at')
+    indexed_fields = ()
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
@@ -25,13 +110,15 @@ class Base():
 
         self.id = kwargs.get('id', str(uuid.uuid4()))
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self.created_at = parse_timestamp(kwargs.get('created_at'))
         else:
             self.created_at = datetime.utcnow()
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            if kwargs.get('updated_at') == kwargs.get('created_at'):
+                # datetimes are immutable: share it, it's most users
+                self.updated_at = self.created_at
+            else:
+                self.updated_at = parse_timestamp(kwargs.get('updated_at'))
         else:
             self.updated_at = datetime.utcnow()
 
@@ -48,7 +135,13 @@ class Base():
         """ Convert the object a JSON dictionary
         """
         result = {}
-        for key, value in self.__dict__.items():
+        # subclasses without __slots__ keep extra attributes in __dict__
+        keys = self._fields() + tuple(getattr(self, '__dict__', {}))
+        for key in keys:
+            try:
+                value = getattr(self, key)
+            except AttributeError:
+                continue
             if not for_serialization and key[0] == '_':
                 continue
             if type(value) is datetime:
@@ -57,41 +150,77 @@ class Base():
                 result[key] = value
         return result
 
+    @classmethod
+    def _fields(cls) -> Tuple[str, ...]:
+        """ Names of the attributes of the class, base classes first
+        """
+        fields = cls.__dict__.get('_fields_cache')
+        if fields is None:
+            fields = []
+            for klass in reversed(cls.__mro__):
+                slots = klass.__dict__.get('__slots__', ())
+                if isinstance(slots, str):
+                    slots = (slots,)
+                fields.extend(slot for slot in slots
+                              if slot not in ('__dict__', '__weakref__'))
+            fields = tuple(fields)
+            cls._fields_cache = fields
+        return fields
+
     @classmethod
     def load_from_file(cls):
-        """ Load all objects from file
+        """ Load all objects from file (snapshot + journal)
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
+        objs = {}
+        DATA[s_class] = objs
+        INDEXES.pop(s_class, None)
+        ORDERS.pop(s_class, None)
+        index = cls._index()
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        for obj_id, raw, obj_json in storage.journal(s_class).load():
+            if raw is None:
+                objs.pop(obj_id, None)
+                if index is not None:
+                    index.discard(obj_id)
+                continue
+            objs[obj_id] = raw
+            if index is not None:
+                index.add(obj_id, tuple(obj_json.get(field)
+                                        for field in index.fields))
 
     @classmethod
-    def save_to_file(cls):
-        """ Save all objects to file
+    def save_to_file(cls, durable: bool = False):
+        """ Save all objects to file (compacts the journal), fsynced
+        with `durable`
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+        def records():
+            for obj_id, obj in list(DATA[s_class].items()):
+                if isinstance(obj, Base):
+                    obj = obj.to_json(True)
+                yield obj_id, obj
+
+        storage.journal(s_class).reset(records(), durable)
 
     def save(self):
         """ Save current object
         """
         s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
+        is_new = DATA[s_class].get(self.id) is None
         DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        self.__class__._index_object(self)
+        if is_new:
+            with ORDERS_LOCK:
+                order = ORDERS.get(s_class)
+                if order is not None:
+                    i = bisect.bisect_left(order, self.id)
+                    if i == len(order) or order[i] != self.id:
+                        order.insert(i, self.id)
+        self._persist()
+        self.__class__._notify('save', self)
 
     def remove(self):
         """ Remove object
@@ -99,8 +228,109 @@ class Base():
         s_class = self.__class__.__name__
         if DATA[s_class].get(self.id) is not None:
             del DATA[s_class][self.id]
+            index = INDEXES.get(s_class)
+            if index is not None:
+                index.discard(self.id)
+            with ORDERS_LOCK:
+                order = ORDERS.get(s_class)
+                if order is not None:
+                    i = bisect.bisect_left(order, self.id)
+                    if i < len(order) and order[i] == self.id:
+                        del order[i]
+            self._persist(removed=True)
+            self.__class__._notify('remove', self)
+
+    @classmethod
+    def add_listener(cls, callback: Callable[[str, TypeVar('Base')], None]):
+        """ Call `callback(event, obj)` after each `save()` ('save') and
+        `remove()` ('remove') of an object of this class
+        """
+        LISTENERS.setdefault(cls.__name__, []).append(callback)
+
+    @classmethod
+    def remove_listener(cls, callback: Callable[[str, TypeVar('Base')],
+                                                None]):
+        """ Stop calling a callback given to `add_listener()`
+        """
+        callbacks = LISTENERS.get(cls.__name__, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    @classmethod
+    def _notify(cls, event: str, obj: TypeVar('Base')):
+        """ Call the listeners of this class
+        """
+        for callback in LISTENERS.get(cls.__name__, ()):
+            callback(event, obj)
+
+    def _persist(self, removed: bool = False):
+        """ Persist the change of the current object according to the
+        storage mode: journal record, deferred flush or full rewrite
+        """
+        s_class = self.__class__.__name__
+        if storage.journaling():
+            if removed:
+                storage.journal(s_class).remove(self.id)
+            else:
+                storage.journal(s_class).save(self.to_json(True))
+        elif storage.deferred():
+            storage.FLUSHER.mark(self.__class__)
+        else:
             self.__class__.save_to_file()
 
+    @classmethod
+    def flush(cls):
+        """ Write all pending changes to disk
+        """
+        storage.flush()
+
+    @classmethod
+    def _index(cls) -> Optional[Index]:
+        """ Return the index of this class (None if nothing is indexed)
+        """
+        if not cls.indexed_fields:
+            return None
+        s_class = cls.__name__
+        index = INDEXES.get(s_class)
+        if index is None:
+            index = Index(cls.indexed_fields)
+            INDEXES[s_class] = index
+            for obj_id, obj in list(DATA.get(s_class, {}).items()):
+                if isinstance(obj, Base):
+                    values = tuple(getattr(obj, field, None)
+                                   for field in index.fields)
+                else:
+                    obj_json = obj if type(obj) is dict else json.loads(obj)
+                    values = tuple(obj_json.get(field)
+                                   for field in index.fields)
+                index.add(obj_id, values)
+        return index
+
+    @classmethod
+    def _hydrate(cls, obj_id: str, obj) -> TypeVar('Base'):
+        """ Return the object for a `DATA` entry, building it from its
+        raw record (JSON text or dict) the first time
+        """
+        if obj is None or isinstance(obj, Base):
+            return obj
+        obj_json = obj if type(obj) is dict else json.loads(obj)
+        instance = cls(**obj_json)
+        objs = DATA[cls.__name__]
+        if objs.get(obj_id) is obj:
+            objs[obj_id] = instance
+            return instance
+        return cls._hydrate(obj_id, objs.get(obj_id))
+
+    @classmethod
+    def _index_object(cls, obj: TypeVar('Base')):
+        """ (Re)index one object with its current attribute values
+        """
+        index = cls._index()
+        if index is None:
+            return
+        index.add(obj.id, tuple(getattr(obj, field, None)
+                                for field in index.fields))
+
     @classmethod
     def count(cls) -> int:
         """ Count all objects
@@ -114,12 +344,53 @@ class Base():
         """
         return cls.search()
 
+    @classmethod
+    def page(cls, after: str = None,
+             limit: int = 100) -> List[TypeVar('Base')]:
+        """ Return up to `limit` objects ordered by ID, starting right
+        after the ID `after` (from the first one if None)
+        """
+        s_class = cls.__name__
+        objs = DATA[s_class]
+        result = []
+        while len(result) < limit:
+            with ORDERS_LOCK:
+                order = ORDERS.get(s_class)
+                if order is None:
+                    order = sorted(objs.keys())
+                    ORDERS[s_class] = order
+                start = 0
+                if after is not None:
+                    start = bisect.bisect_right(order, after)
+                obj_ids = order[start:start + limit - len(result)]
+            if len(obj_ids) == 0:
+                break
+            for obj_id in obj_ids:
+                obj = cls._hydrate(obj_id, objs.get(obj_id))
+                if obj is not None:
+                    result.append(obj)
+            after = obj_ids[-1]
+        return result
+
+    @classmethod
+    def iterate(cls, batch: int = 100) -> Iterable[TypeVar('Base')]:
+        """ Yield all objects ordered by ID, `batch` at a time, without
+        building the whole list
+        """
+        after = None
+        while True:
+            objs = cls.page(after, batch)
+            if len(objs) == 0:
+                return
+            yield from objs
+            after = objs[-1].id
+
     @classmethod
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
         s_class = cls.__name__
-        return DATA[s_class].get(id)
+        return cls._hydrate(id, DATA[s_class].get(id))
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
@@ -133,5 +404,21 @@ class Base():
                 if (getattr(obj, k) != v):
                     return False
             return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+
+        objs = DATA[s_class]
+        candidates = None
+        index = cls._index()
+        if index is not None:
+            for k, v in attributes.items():
+                ids = index.lookup(k, v)
+                if ids is not None and (candidates is None or
+                                        len(ids) < len(candidates)):
+                    candidates = ids
+        if candidates is None:
+            candidates = list(objs.keys())
+        else:
+            candidates = list(candidates)
+
+        matches = [cls._hydrate(obj_id, objs.get(obj_id))
+                   for obj_id in candidates]
+        return [obj for obj in matches if obj is not None and _search(obj)]
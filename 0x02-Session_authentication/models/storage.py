@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+""" Storage module: files backing the models
+"""
+from os import getenv, path
+import atexit
+import json
+import os
+import threading
+
+
+STORAGE_MODE = getenv('MODELS_STORAGE', 'file')
+JOURNAL_MAX_RECORDS = int(getenv('MODELS_JOURNAL_MAX', '1000'))
+FLUSH_INTERVAL = float(getenv('MODELS_FLUSH_INTERVAL', '1.0'))
+FLUSH_THRESHOLD = int(getenv('MODELS_FLUSH_THRESHOLD', '100'))
+JOURNALS = {}
+JOURNALS_LOCK = threading.Lock()
+
+
+def snapshot_path(s_class: str) -> str:
+    """ Path of the snapshot file of a class
+    """
+    return ".db_{}.json".format(s_class)
+
+
+def journal_path(s_class: str) -> str:
+    """ Path of the journal file of a class
+    """
+    return ".db_{}.journal".format(s_class)
+
+
+def iter_snapshot(file_path: str, chunk_size: int = 1 << 16):
+    """ Stream the records of a snapshot file without loading the whole
+    document: yield (obj_id, raw JSON text, parsed dict) per object
+    """
+    if not path.exists(file_path):
+        return
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r') as f:
+        buf = ""
+        pos = 0
+        eof = False
+
+        def fill():
+            """ Drop the consumed text and read the next chunk """
+            nonlocal buf, pos, eof
+            data = f.read(chunk_size)
+            eof = (data == "")
+            buf = buf[pos:] + data
+            pos = 0
+
+        def skip() -> str:
+            """ Skip whitespaces, return the next character ('' at EOF) """
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n":
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return buf[pos:pos + 1]
+                fill()
+
+        def decode():
+            """ Decode the JSON value starting at `pos` """
+            nonlocal pos
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                except ValueError:
+                    if eof:
+                        raise
+                    fill()
+                    continue
+                if end == len(buf) and not eof:
+                    # the value may continue in the next chunk
+                    fill()
+                    continue
+                start = pos
+                pos = end
+                return value, buf[start:end]
+
+        if skip() != '{':
+            raise ValueError("{} is not a JSON object".format(file_path))
+        pos += 1
+        while True:
+            c = skip()
+            if c == '}':
+                return
+            if c == ',':
+                pos += 1
+                skip()
+            obj_id, _ = decode()
+            if skip() != ':':
+                raise ValueError("{}: ':' expected".format(file_path))
+            pos += 1
+            skip()
+            obj_json, text = decode()
+            yield obj_id, text, obj_json
+
+
+def write_snapshot(file_path: str, records, durable: bool = False):
+    """ Atomically replace a snapshot file with `records`, an iterable
+    of (obj_id, raw JSON text or dict): write a temporary file next to
+    it, then rename it over the old one. With `durable`, the file is
+    fsynced before the rename (when the journal it replaces is deleted
+    next, or for the deferred flush), not on each save of the `file`
+    mode
+    """
+    tmp_path = "{}.tmp".format(file_path)
+    with open(tmp_path, 'w') as f:
+        f.write("{")
+        sep = ""
+        for obj_id, obj_json in records:
+            if type(obj_json) is not str:
+                obj_json = json.dumps(obj_json)
+            f.write("{}{}: {}".format(sep, json.dumps(obj_id), obj_json))
+            sep = ", "
+        f.write("}")
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+
+
+def iter_journal(file_path: str):
+    """ Stream the records of a journal file: yield (obj_id, obj_json,
+    obj_json) for a save and (obj_id, None, None) for a removal
+    """
+    if not path.exists(file_path):
+        return
+    with open(file_path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # torn write at the end of a crashed journal
+                continue
+            if record.get('op') == 'save':
+                obj_json = record.get('obj')
+                yield obj_json.get('id'), obj_json, obj_json
+            elif record.get('op') == 'remove':
+                yield record.get('id'), None, None
+
+
+class Journal():
+    """ Append-only journal of the mutations of one class
+
+    Each `save()`/`remove()` appends one line to `.db_{Class}.journal`.
+    Past `JOURNAL_MAX_RECORDS` lines the journal is rotated and a
+    background thread folds it into the `.db_{Class}.json` snapshot.
+
+    `lock` guards the journal file; `snapshot_lock` the snapshot and
+    the rotated journal, held by a compaction from start to end and by
+    `reset()`, so appends don't wait for a compaction.
+    """
+
+    def __init__(self, s_class: str):
+        """ Initialize the journal of the class `s_class`
+        """
+        self.s_class = s_class
+        self.path = journal_path(s_class)
+        self.rotated_path = "{}.1".format(self.path)
+        self.records = 0
+        self.lock = threading.Lock()
+        self.snapshot_lock = threading.Lock()
+        self.__file = None
+        self.__compaction = None
+
+    def append(self, record: dict):
+        """ Append one record to the journal
+        """
+        line = json.dumps(record) + "\n"
+        with self.lock:
+            if self.__file is None:
+                self.__file = open(self.path, 'a')
+            self.__file.write(line)
+            self.__file.flush()
+            self.records += 1
+            if self.records >= JOURNAL_MAX_RECORDS:
+                self.__start_compaction()
+
+    def save(self, obj_json: dict):
+        """ Record the new state of an object
+        """
+        self.append({'op': 'save', 'obj': obj_json})
+
+    def remove(self, obj_id: str):
+        """ Record the removal of an object
+        """
+        self.append({'op': 'remove', 'id': obj_id})
+
+    def load(self):
+        """ Stream the snapshot then the journal records on top of it:
+        yield (obj_id, raw record, parsed dict), raw record being None
+        when the object was removed
+        """
+        self.wait()
+        yield from iter_snapshot(snapshot_path(self.s_class))
+        yield from iter_journal(self.rotated_path)
+        records = 0
+        for record in iter_journal(self.path):
+            records += 1
+            yield record
+        self.records = records
+
+    def reset(self, records, durable: bool = False):
+        """ Replace the snapshot by `records` and empty the journal
+        (fsync the snapshot first with `durable`)
+        """
+        with self.snapshot_lock, self.lock:
+            write_snapshot(snapshot_path(self.s_class), records, durable)
+            self.__close()
+            for file_path in (self.path, self.rotated_path):
+                if path.exists(file_path):
+                    os.remove(file_path)
+            self.records = 0
+
+    def wait(self):
+        """ Wait for a running compaction to finish
+        """
+        compaction = self.__compaction
+        if compaction is not None:
+            compaction.join()
+
+    def compact(self):
+        """ Fold the rotated journal into the snapshot
+        """
+        with self.snapshot_lock:
+            if not path.exists(self.rotated_path):
+                # a reset() ran in between and wrote the whole state
+                return
+            objs = {}
+            for source in (iter_snapshot(snapshot_path(self.s_class)),
+                           iter_journal(self.rotated_path)):
+                for obj_id, raw, _ in source:
+                    if raw is None:
+                        objs.pop(obj_id, None)
+                    else:
+                        objs[obj_id] = raw
+            write_snapshot(snapshot_path(self.s_class), objs.items(),
+                           durable=True)
+            os.remove(self.rotated_path)
+
+    def __start_compaction(self):
+        """ Rotate the journal and compact it in the background
+        (called with `lock` held)
+        """
+        if self.__compaction is not None and self.__compaction.is_alive():
+            return
+        if not path.exists(self.rotated_path):
+            # otherwise a previous compaction didn't finish: redo it first
+            self.__close()
+            os.replace(self.path, self.rotated_path)
+            self.records = 0
+        self.__compaction = threading.Thread(target=self.compact,
+                                             daemon=True)
+        self.__compaction.start()
+
+    def __close(self):
+        """ Close the journal file (called with `lock` held)
+        """
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+
+def journal(s_class: str) -> Journal:
+    """ Return the journal of a class
+    """
+    with JOURNALS_LOCK:
+        if JOURNALS.get(s_class) is None:
+            JOURNALS[s_class] = Journal(s_class)
+        return JOURNALS[s_class]
+
+
+def journaling() -> bool:
+    """ True if mutations are journaled instead of rewriting the snapshot
+    """
+    return STORAGE_MODE == 'journal'
+
+
+def deferred() -> bool:
+    """ True if snapshots are written behind by the flusher
+    """
+    return STORAGE_MODE == 'deferred'
+
+
+class Flusher():
+    """ Write-behind of the snapshots of the dirty classes
+
+    `mark()` only records that a class changed. A background thread
+    rewrites the snapshot of every dirty class once per `FLUSH_INTERVAL`
+    seconds, or as soon as a class reaches `FLUSH_THRESHOLD` changes, so
+    a burst of mutations costs one write.
+    """
+
+    def __init__(self):
+        """ Initialize a flusher with no dirty class
+        """
+        self.dirty = {}
+        self.flushes = 0
+        self.cond = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.__thread = None
+
+    def mark(self, cls):
+        """ Record one change of the class `cls`
+        """
+        with self.cond:
+            self.dirty[cls] = self.dirty.get(cls, 0) + 1
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.run,
+                                                 daemon=True)
+                self.__thread.start()
+            if self.dirty[cls] >= FLUSH_THRESHOLD:
+                self.cond.notify()
+
+    def run(self):
+        """ Flushing loop of the background thread
+        """
+        while True:
+            with self.cond:
+                self.cond.wait(FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        """ Write the snapshot of every dirty class now
+        """
+        with self.flush_lock:
+            with self.cond:
+                dirty = list(self.dirty.keys())
+                self.dirty.clear()
+            for cls in dirty:
+                cls.save_to_file(durable=True)
+            if dirty:
+                self.flushes += 1
+
+
+FLUSHER = Flusher()
+atexit.register(FLUSHER.flush)
+
+
+def flush():
+    """ Write all pending changes: dirty snapshots and running compactions
+    """
+    FLUSHER.flush()
+    with JOURNALS_LOCK:
+        journals = list(JOURNALS.values())
+    for pending in journals:
+        pending.wait()
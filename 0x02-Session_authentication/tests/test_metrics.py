@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+""" Tests of the Metrics module
+"""
+import threading
+import unittest
+
+from api.v1.metrics import Metrics
+
+
+class TestMetrics(unittest.TestCase):
+    """ Tests of Metrics """
+
+    def test_shards_bounded_without_scrape(self):
+        """ Shards of finished threads don't pile up between scrapes """
+        metrics = Metrics()
+        for batch in range(200):
+            threads = [threading.Thread(
+                target=metrics.observe, args=('/x', 'GET', 200, 0.001))
+                for _ in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertLessEqual(metrics.shard_count(), 20)
+        statuses = metrics.snapshot()[0]
+        self.assertEqual(statuses[('/x', 'GET', 200)], 2000)
+        self.assertEqual(metrics.shard_count(), 0)
+
+    def test_render_counts(self):
+        """ The counters and histograms of all threads are rendered """
+        metrics = Metrics()
+        metrics.observe('/a', 'GET', 200, 0.002)
+        thread = threading.Thread(target=metrics.observe,
+                                  args=('/a', 'GET', 404, 20.0))
+        thread.start()
+        thread.join()
+        text = metrics.render()
+        self.assertIn('http_requests_total{endpoint="/a",method="GET",'
+                      'status="200"} 1', text)
+        self.assertIn('http_requests_total{endpoint="/a",method="GET",'
+                      'status="404"} 1', text)
+        self.assertIn('http_request_duration_seconds_bucket{endpoint="/a",'
+                      'method="GET",le="+Inf"} 2', text)
+
+    def test_collectors(self):
+        """ The samples of the collectors are rendered until removed """
+        metrics = Metrics()
+        values = {'size': 3}
+
+        def collect():
+            return [('widgets', 'gauge', 'Widgets.', values['size'])]
+
+        metrics.add_collector(collect)
+        self.assertIn('# TYPE widgets gauge\nwidgets 3\n', metrics.render())
+        values['size'] = 4
+        self.assertIn('widgets 4\n', metrics.render())
+        metrics.remove_collector(collect)
+        metrics.remove_collector(collect)
+        self.assertNotIn('widgets', metrics.render())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+""" Tests of the SessionAuth module and of the memory session store
+"""
+import threading
+import time
+import unittest
+
+from api.v1.auth.session_auth import SessionAuth
+from api.v1.auth.session_expiry import SessionExpiry
+from api.v1.auth.session_store import MemorySessionStore
+from models.base import LISTENERS
+
+
+class TestSessionAuthClose(unittest.TestCase):
+    """ A closed SessionAuth leaves no listener nor reaper behind """
+
+    def test_close(self):
+        """ close() unregisters the listener and stops the reaper """
+        listeners = len(LISTENERS.get('User', ()))
+        auths = [SessionAuth(store=MemorySessionStore(),
+                             expiry=SessionExpiry(ttl=60))
+                 for _ in range(3)]
+        self.assertEqual(len(LISTENERS['User']), listeners + 3)
+        self.assertTrue(all(auth.expiry.running for auth in auths))
+        for auth in auths:
+            auth.close()
+            auth.close()
+        self.assertEqual(len(LISTENERS['User']), listeners)
+        self.assertFalse(any(auth.expiry.running for auth in auths))
+
+
+class SlowDeleteDict(dict):
+    """ A dict that yields to the other threads before each deletion,
+    to widen the race between emptying a set of the index and deleting it
+    """
+
+    def __delitem__(self, key):
+        """ Sleep, then delete """
+        time.sleep(0.0001)
+        super().__delitem__(key)
+
+
+class TestMemorySessionStoreIndex(unittest.TestCase):
+    """ The reverse index survives concurrent writes """
+
+    def test_concurrent_create_and_revoke(self):
+        """ Creations and revocations of one user keep the index exact """
+        store = MemorySessionStore()
+        store.by_user = SlowDeleteDict()
+        auth = SessionAuth(store=store, expiry=SessionExpiry())
+        self.addCleanup(auth.close)
+        errors = []
+
+        def create():
+            try:
+                for _ in range(1000):
+                    auth.create_session("user")
+            except Exception as e:
+                errors.append(e)
+
+        def revoke():
+            try:
+                for _ in range(200):
+                    auth.destroy_all_sessions("user")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=create) for _ in range(4)] + \
+            [threading.Thread(target=revoke) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        live = {session_id for session_id, user_id in store.sessions.items()
+                if user_id == "user"}
+        self.assertEqual(store.sessions_of("user"), live)
+        auth.destroy_all_sessions("user")
+        self.assertEqual(len(store), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
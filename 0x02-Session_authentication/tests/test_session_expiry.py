@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+""" Tests of the SessionExpiry module
+"""
+import os
+import tempfile
+import unittest
+
+from api.v1.auth.session_expiry import SessionExpiry
+from api.v1.auth.session_store import session_store
+
+
+class TestSessionExpiryRestart(unittest.TestCase):
+    """ Sessions persisted before a restart are reaped """
+
+    def setUp(self):
+        """ Temporary directory of the stores """
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """ Remove the stores """
+        self.tmp.cleanup()
+
+    def check_restart(self, kind):
+        """ Reap the sessions a previous process left in a store """
+        path = os.path.join(self.tmp.name, kind)
+        store = session_store(kind, path)
+        for i in range(5):
+            store.set("old{}".format(i), "user", created_at=1000.0)
+        store.set("recent", "user", created_at=1100.0)
+
+        # restart: a new store on the same file and an empty wheel
+        store = session_store(kind, path)
+        expiry = SessionExpiry(ttl=60)
+        self.assertEqual(len(expiry), 0)
+        self.assertEqual(expiry.seed(store), 6)
+        self.assertEqual(expiry.reap(store, now=1070.0), 5)
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store.get("recent"), "user")
+        self.assertEqual(expiry.reap(store, now=1170.0), 1)
+        self.assertEqual(len(store), 0)
+
+    def test_file_store(self):
+        """ File store """
+        self.check_restart('file')
+
+    def test_sqlite_store(self):
+        """ SQLite store """
+        self.check_restart('sqlite')
+
+    def test_reap_skips_empty_slots(self):
+        """ A reap long after the deadlines only visits the used slots """
+        store = session_store('memory')
+        store.set("ancient", "user", created_at=0.0)
+        store.set("old", "user", created_at=1000.0)
+        expiry = SessionExpiry(ttl=60)
+        expiry.seed(store)
+        # ~3e10 one-second slots in between, each a step if visited
+        self.assertEqual(expiry.reap(store, now=3e10), 2)
+        self.assertEqual(len(store), 0)
+        self.assertEqual(len(expiry), 0)
+
+    def test_seed_disabled(self):
+        """ Nothing is scheduled when sessions never expire """
+        store = session_store('memory')
+        store.set("a", "user", created_at=1000.0)
+        self.assertEqual(SessionExpiry().seed(store), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
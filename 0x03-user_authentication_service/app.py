@@ -4,6 +4,7 @@
 import logging
 from flask import Flask, abort, jsonify, redirect, request
 from auth import Auth
+from hasher import HasherBusy
 
 logging.disable(logging.WARNING)
 
@@ -11,6 +12,22 @@ AUTH = Auth()
 app = Flask(__name__)
 
 
+@app.teardown_appcontext
+def release_db_session(exception) -> None:
+    """Ends the database unit of work of the request.
+    """
+    AUTH.release_db_session()
+
+
+@app.errorhandler(HasherBusy)
+def hasher_busy(error) -> str:
+    """Too many logins at once: shed the load instead of queueing it.
+    """
+    response = jsonify({"message": "service overloaded, retry later"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
 @app.route("/", methods=["GET"], strict_slashes=False)
 def index() -> str:
     """GET /
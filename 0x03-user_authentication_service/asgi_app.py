@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""The endpoints of app.py as a plain ASGI application.
+
+Run it with any ASGI server, e.g. `uvicorn asgi_app:app`, or directly
+(uvicorn needed). The queries run in the AsyncDB executor and bcrypt in
+the hasher pool: a request waiting on either doesn't hold a thread.
+"""
+import json
+from http.cookies import SimpleCookie
+from typing import Awaitable, Callable, Dict, List, Tuple
+from urllib.parse import parse_qs
+
+from auth import AsyncAuth
+from hasher import HASHER, HasherBusy
+
+AUTH = AsyncAuth()
+MAX_BODY = 64 * 1024
+
+
+class Request:
+    """The parts of an HTTP request the endpoints use.
+    """
+
+    def __init__(self, scope: dict, body: bytes) -> None:
+        """Parses the form and the cookies of a request.
+        """
+        self.method = scope["method"]
+        self.path = scope["path"].rstrip("/") or "/"
+        headers = {name.decode("latin-1"): value.decode("latin-1")
+                   for name, value in scope["headers"]}
+        cookie = SimpleCookie(headers.get("cookie", ""))
+        self.cookies = {key: morsel.value for key, morsel in cookie.items()}
+        self.form = {key: values[0] for key, values in
+                     parse_qs(body.decode("utf-8", "replace")).items()}
+
+
+class Response:
+    """An HTTP response.
+    """
+
+    def __init__(self, body: dict = None, status: int = 200,
+                 headers: List[Tuple[str, str]] = None) -> None:
+        """Initializes a JSON response.
+        """
+        self.status = status
+        self.body = b"" if body is None else json.dumps(body).encode()
+        self.headers = [("content-type", "application/json")]
+        self.headers += headers or []
+
+    def set_cookie(self, key: str, value: str) -> None:
+        """Sets a cookie on the whole site.
+        """
+        self.headers.append(("set-cookie", f"{key}={value}; Path=/"))
+
+    async def send(self, send: Callable) -> None:
+        """Sends the response through an ASGI `send`.
+        """
+        headers = [(name.encode("latin-1"), value.encode("latin-1"))
+                   for name, value in self.headers]
+        headers.append((b"content-length", str(len(self.body)).encode()))
+        await send({"type": "http.response.start", "status": self.status,
+                    "headers": headers})
+        await send({"type": "http.response.body", "body": self.body})
+
+
+def abort(status: int) -> Response:
+    """An error response.
+    """
+    return Response({"error": status}, status)
+
+
+async def index(request: Request) -> Response:
+    """GET /
+    Return:
+        - JSON payload containing a welcome message.
+    """
+    return Response({"message": "Bienvenue"})
+
+
+async def users(request: Request) -> Response:
+    """POST /users
+    Return:
+        - JSON payload of the form containing various information.
+    """
+    email = request.form.get("email")
+    password = request.form.get("password")
+    try:
+        await AUTH.register_user(email, password)
+        return Response({"email": email, "message": "user created"})
+    except ValueError:
+        return Response({"message": "email already registered"}, 400)
+
+
+async def login(request: Request) -> Response:
+    """POST /sessions
+    Return:
+        - JSON payload of the form containing login info.
+    """
+    email = request.form.get("email")
+    password = request.form.get("password")
+    if not await AUTH.valid_login(email, password):
+        return abort(401)
+    session_id = await AUTH.create_session(email)
+    response = Response({"email": email, "message": "logged in"})
+    response.set_cookie("session_id", session_id)
+    return response
+
+
+async def logout(request: Request) -> Response:
+    """DELETE /sessions
+    Return:
+        - A redirect if successful.
+    """
+    session_id = request.cookies.get("session_id")
+    user = await AUTH.get_user_from_session_id(session_id)
+    if user is None:
+        return abort(403)
+    await AUTH.destroy_session(user.id)
+    return Response(None, 302, [("location", "/")])
+
+
+async def profile(request: Request) -> Response:
+    """GET /profile
+    Return:
+        - A JSON payload containing the email if successful.
+    """
+    session_id = request.cookies.get("session_id")
+    user = await AUTH.get_user_from_session_id(session_id)
+    if user is None:
+        return abort(403)
+    return Response({"email": user.email})
+
+
+async def get_reset_password_token(request: Request) -> Response:
+    """POST /reset_password
+    Return:
+        - A JSON payload containing the email & reset token if successful.
+    """
+    email = request.form.get("email")
+    try:
+        reset_token = await AUTH.get_reset_password_token(email)
+        return Response({"email": email, "reset_token": reset_token})
+    except ValueError:
+        return abort(403)
+
+
+async def update_password(request: Request) -> Response:
+    """PUT /reset_password
+    Return:
+        - The user's updated password.
+    """
+    email = request.form.get("email")
+    reset_token = request.form.get("reset_token")
+    new_password = request.form.get("new_password")
+    try:
+        await AUTH.update_password(reset_token, new_password)
+        return Response({"email": email, "message": "Password updated"})
+    except ValueError:
+        return abort(403)
+
+
+ROUTES: Dict[str, Dict[str, Callable[[Request], Awaitable[Response]]]] = {
+    "/": {"GET": index},
+    "/users": {"POST": users},
+    "/sessions": {"POST": login, "DELETE": logout},
+    "/profile": {"GET": profile},
+    "/reset_password": {"POST": get_reset_password_token,
+                        "PUT": update_password},
+}
+
+
+async def read_body(receive: Callable) -> bytes:
+    """Reads the body of a request, None if it is too large.
+    """
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY:
+            return None
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def lifespan(receive: Callable, send: Callable) -> None:
+    """Handles the startup and shutdown of the server.
+    """
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            HASHER.shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope: dict, receive: Callable, send: Callable) -> None:
+    """The ASGI application.
+    """
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+    body = await read_body(receive)
+    if body is None:
+        await abort(413).send(send)
+        return
+    request = Request(scope, body)
+    methods = ROUTES.get(request.path)
+    if methods is None:
+        response = abort(404)
+    elif request.method not in methods:
+        response = abort(405)
+    else:
+        try:
+            response = await methods[request.method](request)
+        except HasherBusy:
+            response = Response({"message": "service overloaded, "
+                                            "retry later"},
+                                503, [("retry-after", "1")])
+    await response.send(send)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=5000, log_level="warning")
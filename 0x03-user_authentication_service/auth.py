@@ -3,28 +3,35 @@
 """
 
 import logging
-from typing import Union
+from typing import Dict, Iterable, List, Tuple, Union
 from uuid import uuid4
 
-import bcrypt
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
 
-from db import DB
+from db import DB, AsyncDB
+from hasher import HASHER
 from user import User
 
 logging.disable(logging.WARNING)
 
+# bcrypt only uses (and bcrypt >= 5 only accepts) 72 bytes of password
+BCRYPT_MAX_PASSWORD = 72
+
 
 def _hash_password(password: str) -> bytes:
-    """Hashes a password and returns bytes.
+    """Hashes a password and returns bytes (in the hasher pool).
 
     Args:
         password (str): The password to be hashed.
 
     Returns:
         bytes: The hashed password.
+
+    Raises:
+        HasherBusy: If the hasher pool is saturated.
     """
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+    return HASHER.hash(password)
 
 
 def _generate_uuid() -> str:
@@ -43,6 +50,11 @@ class Auth:
     def __init__(self):
         self._db = DB()
 
+    def release_db_session(self) -> None:
+        """Releases the database session of the current thread.
+        """
+        self._db.remove_session()
+
     def register_user(self, email: str, password: str) -> User:
         """Registers a new user with the given email and password.
 
@@ -60,9 +72,96 @@ class Auth:
             self._db.find_user_by(email=email)
             raise ValueError(f"User {email} already exists")
         except NoResultFound:
-            hashed_password = _hash_password(password)
-            user = self._db.add_user(email, hashed_password)
-            return user
+            pass
+        hashed_password = _hash_password(password)
+        try:
+            return self._db.add_user(email, hashed_password)
+        except IntegrityError:
+            # registered concurrently: the unique index on email caught it
+            raise ValueError(f"User {email} already exists")
+
+    def register_users(self, users: Iterable[Dict[str, str]],
+                       batch_size: int = 1000
+                       ) -> Tuple[int, List[Tuple[int, str, str]]]:
+        """Registers users in bulk. The rows are taken `batch_size` at a
+        time: the emails already registered are found with set-based
+        queries, the passwords hashed on all the hasher workers and the
+        new users inserted in one transaction per batch. A bad row (not
+        an object, email or password missing or not a string, password
+        over the 72 bytes of bcrypt, email taken...) is reported and
+        skipped, the others are still registered.
+
+        Args:
+            users (Iterable[Dict[str, str]]): Rows with an "email" and a
+                "password".
+            batch_size (int): Number of rows per batch.
+
+        Returns:
+            Tuple[int, List[Tuple[int, str, str]]]: The number of users
+                registered and the failures, as (row number from 1,
+                email, reason).
+        """
+        created = 0
+        failures = []
+        seen = set()
+        batch = []
+
+        def flush() -> int:
+            existing = self._db.find_existing_emails(
+                email for _, email, _ in batch)
+            rows = []
+            for row, email, password in batch:
+                if email in existing:
+                    failures.append((row, email, "email already registered"))
+                else:
+                    rows.append((row, email, password))
+            hashed = []
+            for (row, email, _), (hashed_password, error) in zip(
+                    rows, HASHER.hash_many(
+                        password for _, _, password in rows)):
+                if error is not None:
+                    failures.append((row, email, error))
+                else:
+                    hashed.append((row, email, hashed_password))
+            errors = self._db.add_users(
+                [(email, hashed_password)
+                 for _, email, hashed_password in hashed])
+            for (row, email, _), error in zip(hashed, errors):
+                if error is not None:
+                    failures.append((row, email, error))
+            batch.clear()
+            return errors.count(None)
+
+        for row, user in enumerate(users, 1):
+            if not isinstance(user, dict):
+                failures.append((row, "", "row is not an object"))
+                continue
+            email = user.get("email") or ""
+            password = user.get("password") or ""
+            if not isinstance(email, str):
+                failures.append((row, "", "email must be a string"))
+                continue
+            email = email.strip()
+            if not email:
+                failures.append((row, email, "missing email"))
+            elif not isinstance(password, str):
+                failures.append((row, email, "password must be a string"))
+            elif not password:
+                failures.append((row, email, "missing password"))
+            elif len(password.encode("utf-8", "surrogatepass")) > \
+                    BCRYPT_MAX_PASSWORD:
+                failures.append((row, email, "password longer than "
+                                 f"{BCRYPT_MAX_PASSWORD} bytes"))
+            elif email in seen:
+                failures.append((row, email, "duplicate email in input"))
+            else:
+                seen.add(email)
+                batch.append((row, email, password))
+                if len(batch) >= batch_size:
+                    created += flush()
+        if batch:
+            created += flush()
+        return created, sorted(failures)
 
     def valid_login(self, email: str, password: str) -> bool:
         """Validate user login credentials.
@@ -73,13 +172,17 @@ class Auth:
 
         Returns:
             bool: True if the login is valid, False otherwise.
+
+        Raises:
+            HasherBusy: If the hasher pool is saturated.
         """
         try:
-            user = DB().find_user_by(email=email)
+            user = self._db.find_user_by(email=email)
             if user:
-                hashed_pw = user.hashed_password.encode("utf-8")
-                password_encoded = password.encode("utf-8")
-                pwd_valid = bcrypt.checkpw(password_encoded, hashed_pw)
+                hashed_pw = user.hashed_password
+                if isinstance(hashed_pw, str):
+                    hashed_pw = hashed_pw.encode("utf-8")
+                pwd_valid = HASHER.check(password, hashed_pw)
                 if pwd_valid:
                     return True
             return False
@@ -171,3 +274,95 @@ class Auth:
             )
         except NoResultFound:
             raise ValueError("Invalid reset token")
+
+
+class AsyncAuth:
+    """Awaitable version of Auth for the ASGI app: same methods on the
+    same database, the queries run in the AsyncDB executor and bcrypt in
+    the hasher pool, so the event loop never blocks.
+    """
+
+    def __init__(self, auth: Auth = None):
+        """Wraps `auth` (a new Auth by default).
+        """
+        self.auth = Auth() if auth is None else auth
+        self._db = AsyncDB(self.auth._db)
+
+    async def register_user(self, email: str, password: str) -> User:
+        """Registers a new user, see Auth.register_user.
+        """
+        try:
+            await self._db.find_user_by(email=email)
+            raise ValueError(f"User {email} already exists")
+        except NoResultFound:
+            pass
+        hashed_password = await HASHER.hash_async(password)
+        try:
+            return await self._db.add_user(email, hashed_password)
+        except IntegrityError:
+            raise ValueError(f"User {email} already exists")
+
+    async def valid_login(self, email: str, password: str) -> bool:
+        """Validates user login credentials, see Auth.valid_login.
+        """
+        try:
+            user = await self._db.find_user_by(email=email)
+        except NoResultFound:
+            return False
+        hashed_pw = user.hashed_password
+        if isinstance(hashed_pw, str):
+            hashed_pw = hashed_pw.encode("utf-8")
+        return await HASHER.check_async(password, hashed_pw)
+
+    async def create_session(self, email: str) -> Union[str, None]:
+        """Creates a session, see Auth.create_session.
+        """
+        try:
+            user = await self._db.find_user_by(email=email)
+        except NoResultFound:
+            return None
+        session_id = _generate_uuid()
+        await self._db.update_user(user.id, session_id=session_id)
+        return session_id
+
+    async def get_user_from_session_id(
+            self, session_id: str) -> Union[User, None]:
+        """Retrieves the user of a session, see
+        Auth.get_user_from_session_id.
+        """
+        if not session_id:
+            return None
+        try:
+            return await self._db.find_user_by(session_id=session_id)
+        except NoResultFound:
+            return None
+
+    async def destroy_session(self, user_id: int) -> None:
+        """Destroys the session of a user, see Auth.destroy_session.
+        """
+        if user_id:
+            await self._db.update_user(user_id, session_id=None)
+
+    async def get_reset_password_token(self, email: str) -> str:
+        """Generates a password reset token, see
+        Auth.get_reset_password_token.
+        """
+        try:
+            user = await self._db.find_user_by(email=email)
+        except NoResultFound:
+            raise ValueError(f"User with email {email} does not exist")
+        reset_token = _generate_uuid()
+        await self._db.update_user(user.id, reset_token=reset_token)
+        return reset_token
+
+    async def update_password(self, reset_token: str, password: str) -> None:
+        """Updates a password with a reset token, see Auth.update_password.
+        """
+        try:
+            user = await self._db.find_user_by(reset_token=reset_token)
+        except NoResultFound:
+            raise ValueError("Invalid reset token")
+        hashed_password = await HASHER.hash_async(password)
+        await self._db.update_user(
+            user.id, hashed_password=hashed_password, reset_token=None
+        )
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Benchmark of `app.py` (Flask, threaded server) against `asgi_app.py`
+(uvicorn) at high concurrency.
+
+Usage: ./bench_asgi.py [connections] [seconds]
+
+Each app is served by its own process in a temporary directory. A few
+users are registered and logged in, then `connections` concurrent
+clients (1000 by default) read GET /profile in a loop, one connection
+per request, for `seconds` seconds. Requests/sec, p50/p99 latency and
+errors (refused or reset connections, non-200 statuses, timeouts) are
+printed for each app. The clients run in this process on one event loop.
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+USERS = 20
+PASSWD = "b4l0u"
+TIMEOUT = 30
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVERS = {
+    "flask": ("from werkzeug.serving import make_server\n"
+              "from app import app\n"
+              "make_server('127.0.0.1', {port}, app, threaded=True)"
+              ".serve_forever()\n"),
+    "asgi": ("import uvicorn\n"
+             "from asgi_app import app\n"
+             "uvicorn.run(app, host='127.0.0.1', port={port}, "
+             "log_level='error', backlog=4096)\n"),
+}
+
+
+def free_port() -> int:
+    """A free local TCP port.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def post(url: str, data: dict) -> tuple:
+    """POSTs a form, returns (status, response cookie header).
+    """
+    body = urllib.parse.urlencode(data).encode()
+    try:
+        with urllib.request.urlopen(url, body) as response:
+            return response.status, response.headers.get("Set-Cookie")
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def start(name: str) -> tuple:
+    """Starts a server, returns (process, port) once it accepts requests.
+    """
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=HERE)
+    process = subprocess.Popen([sys.executable, "-c",
+                                SERVERS[name].format(port=port)],
+                               cwd=tempfile.mkdtemp(), env=env)
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/").close()
+            return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{name} server didn't start")
+
+
+def log_in_users(port: int) -> list:
+    """Registers and logs in USERS users, returns their session IDs.
+    """
+    base_url = f"http://127.0.0.1:{port}"
+    session_ids = []
+    for i in range(USERS):
+        data = {"email": f"user{i}@holberton.io", "password": PASSWD}
+        post(f"{base_url}/users", data)
+        status, cookie = post(f"{base_url}/sessions", data)
+        assert status == 200, f"login failed: {status}"
+        session_ids.append(cookie.split(";")[0].split("=", 1)[1])
+    return session_ids
+
+
+async def client(port: int, request: bytes, stop_at: float,
+                 latencies: list, errors: list) -> None:
+    """Sends `request` on a new connection each time until `stop_at`.
+    """
+    while time.perf_counter() < stop_at:
+        start_time = time.perf_counter()
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection("127.0.0.1", port), TIMEOUT)
+            writer.write(request)
+            response = await asyncio.wait_for(reader.read(), TIMEOUT)
+            writer.close()
+        except (OSError, asyncio.TimeoutError):
+            errors.append(None)
+            await asyncio.sleep(0.01)
+            continue
+        if response[9:12] == b"200":
+            latencies.append(time.perf_counter() - start_time)
+        else:
+            errors.append(response[9:12])
+
+
+async def load(port: int, session_ids: list, connections: int,
+               duration: float) -> tuple:
+    """Runs `connections` clients for `duration` seconds.
+    """
+    stop_at = time.perf_counter() + duration
+    latencies, errors = [], []
+    requests = [(f"GET /profile HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+                 f"Cookie: session_id={session_id}\r\n"
+                 f"Connection: close\r\n\r\n").encode()
+                for session_id in session_ids]
+    await asyncio.gather(*(client(port, requests[i % len(requests)],
+                                  stop_at, latencies, errors)
+                           for i in range(connections)))
+    return sorted(latencies), errors
+
+
+def percentile(values: list, p: float) -> float:
+    """p-th percentile of sorted values.
+    """
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+if __name__ == "__main__":
+    connections = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    print(f"{connections} connections, {duration:g}s, GET /profile")
+    for name in SERVERS:
+        process, port = start(name)
+        try:
+            session_ids = log_in_users(port)
+            latencies, errors = asyncio.run(
+                load(port, session_ids, connections, duration))
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"{name:>6}: {len(latencies) / duration:7.1f} req/s "
+              f"p50 {percentile(latencies, 50) * 1000:7.1f}ms "
+              f"p99 {percentile(latencies, 99) * 1000:7.1f}ms "
+              f"{len(errors)} errors")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Benchmark of `DB.find_user_by` latency by table size.
+
+Usage: ./bench_find_user_by.py [rows ...]   (default: 10000 100000 1000000)
+
+Fills a fresh database in a temporary directory, then times lookups by
+email and by session_id, which are both indexed.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from uuid import uuid4
+
+from db import DB
+from user import User
+
+LOOKUPS = 2000
+
+
+def fill(db: DB, rows: int) -> list:
+    """Insert `rows` users in batches, return their (email, session_id).
+    """
+    keys = []
+    batch = []
+    for i in range(rows):
+        keys.append((f"user{i}@holberton.io", str(uuid4())))
+        batch.append({"email": keys[-1][0], "hashed_password": "x" * 60,
+                      "session_id": keys[-1][1]})
+        if len(batch) == 10000 or i == rows - 1:
+            db._session.bulk_insert_mappings(User, batch)
+            db._session.commit()
+            batch = []
+    return keys
+
+
+def timed(db: DB, column: str, values: list) -> float:
+    """Return the mean latency (in microseconds) of lookups on `column`.
+    """
+    start = time.perf_counter()
+    for value in values:
+        db.find_user_by(**{column: value})
+    return (time.perf_counter() - start) / len(values) * 1e6
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            # one database (and engine) per size, by absolute path
+            db = DB(reset=False,
+                    url=f"sqlite:///{os.path.join(tmp, f'{rows}.db')}")
+            start = time.perf_counter()
+            keys = random.sample(fill(db, rows), min(LOOKUPS, rows))
+            filled = time.perf_counter() - start
+            by_email = timed(db, "email", [key[0] for key in keys])
+            by_session = timed(db, "session_id", [key[1] for key in keys])
+            print(f"{rows:>8} rows: email {by_email:7.1f} us, "
+                  f"session_id {by_session:7.1f} us "
+                  f"(filled in {filled:.1f}s)")
+            db.remove_session()
+            db._engine.dispose()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Load test of `app.py`: latency of GET /profile while POST /sessions
+is saturated.
+
+Usage: ./bench_hasher_load.py [login threads] [profile threads] [seconds]
+
+Serves the app with a threaded server in a temporary directory. Login
+threads post /sessions in a loop (bcrypt bound), profile threads read
+/profile in a loop (one indexed query); the p50/p99 latency of /profile
+and the outcome of the logins (200, 503 shed by the hasher, errors) are
+printed. The hasher is configured by HASH_WORKERS, HASH_QUEUE_DEPTH and
+HASH_TIMEOUT, e.g. compare HASH_WORKERS=0 (bcrypt in the request
+threads) with the default pool.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+
+USERS = 16
+PASSWD = "b4l0u"
+
+
+def post(url: str, data: dict) -> tuple:
+    """POSTs a form, returns (status, response cookie header).
+    """
+    body = urllib.parse.urlencode(data).encode()
+    try:
+        with urllib.request.urlopen(url, body) as response:
+            return response.status, response.headers.get("Set-Cookie")
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def percentile(values: list, p: float) -> float:
+    """p-th percentile of sorted values.
+    """
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def login_loop(base_url: str, i: int, stop: threading.Event,
+               statuses: Counter) -> None:
+    """Logs a user in until stopped, counting the statuses.
+    """
+    data = {"email": f"user{i % USERS}@holberton.io", "password": PASSWD}
+    while not stop.is_set():
+        try:
+            status, _ = post(f"{base_url}/sessions", data)
+        except OSError:
+            status = "error"
+        statuses[status] += 1
+
+
+def profile_loop(base_url: str, session_id: str, stop: threading.Event,
+                 latencies: list) -> None:
+    """Reads a profile until stopped, recording the latencies.
+    """
+    request = urllib.request.Request(f"{base_url}/profile",
+                                     headers={"Cookie":
+                                              f"session_id={session_id}"})
+    while not stop.is_set():
+        start = time.perf_counter()
+        with urllib.request.urlopen(request) as response:
+            response.read()
+        latencies.append(time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    login_threads = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    profile_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    duration = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(tempfile.mkdtemp())
+
+    from werkzeug.serving import make_server
+    from app import app
+    from hasher import HASHER
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    for i in range(USERS):
+        status, _ = post(f"{base_url}/users",
+                         {"email": f"user{i}@holberton.io",
+                          "password": PASSWD})
+        assert status == 200, f"registration failed: {status}"
+    # the profile readers log in with a user of their own
+    session_ids = []
+    for i in range(profile_threads):
+        email = f"reader{i}@holberton.io"
+        post(f"{base_url}/users", {"email": email, "password": PASSWD})
+        _, cookie = post(f"{base_url}/sessions",
+                         {"email": email, "password": PASSWD})
+        session_ids.append(cookie.split(";")[0].split("=", 1)[1])
+
+    def measure(logins: int) -> tuple:
+        """Runs the profile readers for `duration` seconds next to
+        `logins` login threads.
+        """
+        stop = threading.Event()
+        statuses = Counter()
+        latencies = []
+        threads = [threading.Thread(target=login_loop,
+                                    args=(base_url, i, stop, statuses))
+                   for i in range(logins)]
+        threads += [threading.Thread(target=profile_loop,
+                                     args=(base_url, session_id, stop,
+                                           latencies))
+                    for session_id in session_ids]
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return sorted(latencies), statuses
+
+    print(f"hasher: {HASHER.workers} workers (0: inline), "
+          f"queue depth {HASHER.max_pending}, timeout {HASHER.timeout}s")
+    for logins in (0, login_threads):
+        latencies, statuses = measure(logins)
+        print(f"{logins:>3} login threads: /profile "
+              f"p50 {percentile(latencies, 50) * 1000:7.1f}ms "
+              f"p99 {percentile(latencies, 99) * 1000:7.1f}ms "
+              f"({len(latencies) / duration:6.1f}/s)", end="")
+        if logins:
+            print(f", /sessions {statuses[200] / duration:5.1f} ok/s "
+                  f"{statuses[503] / duration:6.1f} shed/s, "
+                  f"{sum(statuses.values()) - statuses[200] - statuses[503]}"
+                  f" errors", end="")
+        print()
+    server.shutdown()
+    HASHER.shutdown()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Startup benchmark: cost of booting `app.py` and of the first login.
+
+Usage: ./bench_startup.py [users]
+
+Each measure runs in a fresh process on a database in a temporary
+directory: a cold boot creating the schema, a boot on an existing
+database of `users` users (default 10000), then the first login.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+SETUP = """
+import bcrypt
+from db import DB
+from user import User
+db = DB()
+hashed = bcrypt.hashpw(b"b4l0u", bcrypt.gensalt())
+db._session.bulk_insert_mappings(User, [
+    {{"email": f"user{{i}}@holberton.io", "hashed_password": hashed}}
+    for i in range({})])
+db._session.commit()
+"""
+
+BOOT = """
+import time
+start = time.perf_counter()
+import app
+boot = time.perf_counter() - start
+client = app.app.test_client()
+start = time.perf_counter()
+response = client.post("/sessions", data={"email": "user0@holberton.io",
+                                          "password": "b4l0u"})
+login = time.perf_counter() - start
+print(boot, login, response.status_code)
+"""
+
+
+def run(code: str, cwd: str, env: dict) -> str:
+    """Runs `code` in a new interpreter, returns its output.
+    """
+    return subprocess.check_output([sys.executable, "-c", code],
+                                   cwd=cwd, env=env).decode()
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=here)
+    env.pop("DB_RESET", None)
+    with tempfile.TemporaryDirectory() as tmp:
+        boot, _, _ = run(BOOT, tmp, env).split()
+        print(f"cold boot (creates the schema): {float(boot) * 1000:7.1f} ms")
+        run(SETUP.format(users), tmp, env)
+        boot, login, status = run(BOOT, tmp, env).split()
+        print(f"boot on {users} users:          "
+              f"{float(boot) * 1000:7.1f} ms")
+        print(f"first login (status {status}):     "
+              f"{float(login) * 1000:7.1f} ms")
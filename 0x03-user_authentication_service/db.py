@@ -1,41 +1,146 @@
 #!/usr/bin/env python3
 """DB module
 """
+import asyncio
+import functools
 import logging
-from typing import Dict
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Set, Tuple
 
-from sqlalchemy import create_engine
-from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import IntegrityError, InvalidRequestError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.orm.session import Session
+from sqlalchemy.pool import QueuePool
 
 from user import Base, User
 
 logging.disable(logging.WARNING)
 
+DB_URL = os.getenv("DB_URL", "sqlite:///a.db")
+DB_ECHO = os.getenv("DB_ECHO", "") not in ("", "0")
+DB_RESET = os.getenv("DB_RESET", "") not in ("", "0")
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+POOL_OVERFLOW = int(os.getenv("DB_POOL_OVERFLOW", "24"))
+BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "5"))
+# bound parameters per IN query, under SQLite's limit of 999
+IN_CHUNK = 500
+
+
+def _configure_sqlite(dbapi_connection, connection_record) -> None:
+    """Sets up each new SQLite connection: WAL journal so readers don't
+    block the writer, and a busy timeout instead of failing on locks.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT * 1000)}")
+    cursor.close()
+
+
+def _migrate(engine: Engine) -> None:
+    """Brings the schema up to date without touching the data: creates
+    the missing tables, then the missing columns and indexes of the
+    existing ones.
+    """
+    Base.metadata.create_all(engine)
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"]
+                    for column in inspector.get_columns(table.name)}
+        with engine.begin() as connection:
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(
+                    f"ALTER TABLE {table.name} "
+                    f"ADD COLUMN {column.name} {column_type}"))
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+_ENGINES = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def _absolute_url(url: str) -> str:
+    """Resolves the path of a SQLite URL against the current directory:
+    a relative one would be opened from the current directory of each
+    new connection, so one engine could serve several files.
+    """
+    parsed = make_url(url)
+    database = parsed.database
+    if (parsed.get_backend_name() != "sqlite" or not database
+            or database == ":memory:" or database.startswith("file:")
+            or os.path.isabs(database)):
+        return url
+    return parsed.set(
+        database=os.path.abspath(database)).render_as_string(
+            hide_password=False)
+
+
+def get_engine(url: str = DB_URL) -> Engine:
+    """Returns the engine of a database URL, created (and its schema
+    migrated) once per process. SQLite paths are resolved against the
+    current directory first.
+    """
+    url = _absolute_url(url)
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(url)
+        if engine is None:
+            engine = create_engine(
+                url, echo=DB_ECHO,
+                poolclass=QueuePool, pool_size=POOL_SIZE,
+                max_overflow=POOL_OVERFLOW, pool_timeout=BUSY_TIMEOUT,
+                connect_args={"check_same_thread": False,
+                              "timeout": BUSY_TIMEOUT})
+            event.listen(engine, "connect", _configure_sqlite)
+            _migrate(engine)
+            _ENGINES[url] = engine
+        return engine
+
 
 class DB:
     """DB class
     """
 
-    def __init__(self) -> None:
-        """Initialize a new DB instance
+    def __init__(self, reset: bool = DB_RESET, url: str = DB_URL) -> None:
+        """Initialize a new DB instance on the shared engine
+
+        Args:
+            reset (bool): Drop and recreate the tables (all the data is
+                lost), DB_RESET by default. Ignored in child processes:
+                the spawned hasher workers re-import the main script
+                (app.py), they must not drop the tables of the server.
+            url (str): Database URL, DB_URL by default.
         """
-        self._engine = create_engine("sqlite:///a.db", echo=True)
-        Base.metadata.drop_all(self._engine)
-        Base.metadata.create_all(self._engine)
-        self.__session = None
+        self._engine = get_engine(url)
+        # workers are named before they import the main script, while
+        # parent_process() is only set after it
+        if reset and multiprocessing.current_process().name == "MainProcess":
+            Base.metadata.drop_all(self._engine)
+            Base.metadata.create_all(self._engine)
+        self.__session = scoped_session(
+            sessionmaker(bind=self._engine, expire_on_commit=False))
 
     @property
     def _session(self) -> Session:
-        """Memoized session object
+        """Session of the current thread (one unit of work per request)
         """
-        if self.__session is None:
-            DBSession = sessionmaker(bind=self._engine)
-            self.__session = DBSession()
-        return self.__session
+        return self.__session()
+
+    def remove_session(self) -> None:
+        """Closes the session of the current thread and gives its
+        connection back to the pool (at the end of each request).
+        """
+        self.__session.remove()
 
     def add_user(self, email: str, hashed_password: str) -> User:
         """Adds a new user to the db with the given email and hashed password.
@@ -51,12 +156,61 @@ class DB:
         try:
             self._session.add(new_user)
             self._session.commit()
+        except IntegrityError:
+            # duplicate email: reported to the caller
+            self._session.rollback()
+            raise
         except Exception as e:
             print(f"Error adding user to database: {e}")
             self._session.rollback()
             raise
         return new_user
 
+    def add_users(self, users: List[Tuple[str, str]]) -> List[str]:
+        """Adds users in one transaction. If it fails (an email taken in
+        the meantime), each user is retried in a transaction of its own.
+
+        Args:
+            users (List[Tuple[str, str]]): (email, hashed_password) pairs.
+
+        Returns:
+            List[str]: One error per user, None for the added ones.
+        """
+        session = self._session
+        try:
+            session.bulk_insert_mappings(
+                User, [{"email": email, "hashed_password": hashed_password}
+                       for email, hashed_password in users])
+            session.commit()
+            return [None] * len(users)
+        except IntegrityError:
+            session.rollback()
+        errors = []
+        for email, hashed_password in users:
+            try:
+                self.add_user(email, hashed_password)
+                errors.append(None)
+            except IntegrityError:
+                errors.append("email already registered")
+        return errors
+
+    def find_existing_emails(self, emails: Iterable[str]) -> Set[str]:
+        """Returns the emails already registered among `emails`, with
+        one IN query per IN_CHUNK emails.
+        """
+        emails = list(emails)
+        session = self._session
+        existing = set()
+        try:
+            for i in range(0, len(emails), IN_CHUNK):
+                chunk = emails[i:i + IN_CHUNK]
+                existing.update(
+                    email for email, in session.query(User.email).filter(
+                        User.email.in_(chunk)))
+        finally:
+            session.commit()
+        return existing
+
     def find_user_by(self, **kwargs: Dict[str, str]) -> User:
         """Find a user by specified attributes.
 
@@ -74,6 +228,10 @@ class DB:
             raise NoResultFound()
         except InvalidRequestError:
             raise InvalidRequestError()
+        finally:
+            # end the read transaction: its connection goes back to the
+            # pool instead of being held while the caller hashes passwords
+            session.commit()
         return user
 
     def update_user(self, user_id: int, **kwargs) -> None:
@@ -105,3 +263,52 @@ class DB:
             self._session.commit()
         except InvalidRequestError:
             raise ValueError("Invalid request")
+
+
+class AsyncDB:
+    """Awaitable facade of DB for event loops: each call runs in a thread
+    of a bounded executor (no more threads than pooled connections), in a
+    session released right after it.
+    """
+
+    def __init__(self, db: DB = None, max_workers: int = POOL_SIZE) -> None:
+        """Initialize the facade
+
+        Args:
+            db (DB): The database to wrap, a new DB by default.
+            max_workers (int): Number of threads running the queries.
+        """
+        self._db = DB() if db is None else db
+        self._executor = ThreadPoolExecutor(max_workers,
+                                            thread_name_prefix="db")
+
+    async def add_user(self, email: str, hashed_password: str) -> User:
+        """Awaitable DB.add_user
+        """
+        return await self._run(self._db.add_user, email, hashed_password)
+
+    async def find_user_by(self, **kwargs: Dict[str, str]) -> User:
+        """Awaitable DB.find_user_by
+        """
+        return await self._run(self._db.find_user_by, **kwargs)
+
+    async def update_user(self, user_id: int, **kwargs) -> None:
+        """Awaitable DB.update_user
+        """
+        return await self._run(self._db.update_user, user_id, **kwargs)
+
+    async def _run(self, method, *args, **kwargs):
+        """Runs a DB method in the executor.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(self.__call, method, args, kwargs))
+
+    def __call(self, method, args: tuple, kwargs: dict):
+        """Runs a DB method then releases the session of the thread.
+        """
+        try:
+            return method(*args, **kwargs)
+        finally:
+            self._db.remove_session()
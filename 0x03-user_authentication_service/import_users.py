@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Bulk registration of users from a CSV or NDJSON file.
+
+Usage: ./import_users.py [--format csv|ndjson] [--batch N] [FILE]
+
+Reads FILE (standard input if missing or "-"): CSV with a header line
+naming the "email" and "password" columns, or one JSON object per line
+with the same keys. The format defaults to the extension of FILE, CSV
+otherwise. Users are registered with Auth.register_users in the database
+of DB_URL; each rejected row is printed on standard error and a summary
+with the throughput in users/sec on standard output.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from typing import Dict, IO, Iterator
+
+from auth import Auth
+
+
+def read_csv(stream: IO[str]) -> Iterator[Dict[str, str]]:
+    """Rows of a CSV file with a header.
+    """
+    for row in csv.DictReader(stream):
+        yield row
+
+
+def read_ndjson(stream: IO[str]) -> Iterator[Dict[str, str]]:
+    """Rows of a NDJSON file, an empty row for each invalid line.
+    """
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row if isinstance(row, dict) else {}
+
+
+def main() -> int:
+    """Imports the users, returns the exit status (1 if a row failed).
+    """
+    parser = argparse.ArgumentParser(description="Bulk register users.")
+    parser.add_argument("file", nargs="?", default="-")
+    parser.add_argument("--format", choices=("csv", "ndjson"))
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+    data_format = args.format or (
+        "ndjson" if args.file.endswith((".ndjson", ".jsonl")) else "csv")
+    reader = read_ndjson if data_format == "ndjson" else read_csv
+
+    stream = (sys.stdin if args.file == "-"
+              else open(args.file, newline="", encoding="utf-8"))
+    start = time.perf_counter()
+    with stream:
+        created, failures = Auth().register_users(reader(stream),
+                                                  args.batch)
+    elapsed = time.perf_counter() - start
+    for row, email, reason in failures:
+        print(f"row {row}: {email or '-'}: {reason}", file=sys.stderr)
+    print(f"{created} users registered, {len(failures)} failures in "
+          f"{elapsed:.1f}s ({created / elapsed:.1f} users/sec)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Concurrency test of `app.py` on a local SQLite file.
+
+Usage: ./main_concurrency.py [requests per round]
+
+Serves the app with a threaded server in a temporary directory, then
+runs rounds of parallel login + profile requests with 1, 4, 16 and 64
+client threads, each thread with its own user. Every request must
+succeed with its expected status, and the throughput of each round must
+scale with the threads up to the number of CPUs (SCALING of the ideal
+speedup over one thread) and not drop below MIN_RATIO of it past them.
+Load shedding is turned off (deep hasher queue, long timeout): see
+bench_hasher_load.py for it.
+"""
+import itertools
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+THREADS = (1, 4, 16, 64)
+PASSWD = "b4l0u"
+SCALING = 0.5
+MIN_RATIO = 0.8
+CPUS = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") \
+    else os.cpu_count() or 1
+
+_worker = threading.local()
+_worker_ids = itertools.count()
+
+
+def post(url: str, data: dict) -> tuple:
+    """POSTs a form, returns (status, response cookie header).
+    """
+    body = urllib.parse.urlencode(data).encode()
+    try:
+        with urllib.request.urlopen(url, body) as response:
+            return response.status, response.headers.get("Set-Cookie")
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def init_worker():
+    """Gives the client thread its own user: no other thread logs it in
+    (and replaces its session) while it reads its profile.
+    """
+    _worker.user = next(_worker_ids) % max(THREADS)
+
+
+def login_profile(base_url: str) -> bool:
+    """Logs the user of the thread in then reads its profile, True if
+    both returned 200.
+    """
+    email = f"user{_worker.user}@holberton.io"
+    status, cookie = post(f"{base_url}/sessions",
+                          {"email": email, "password": PASSWD})
+    if status != 200 or cookie is None:
+        return False
+    session_id = cookie.split(";")[0].split("=", 1)[1]
+    request = urllib.request.Request(f"{base_url}/profile",
+                                     headers={"Cookie":
+                                              f"session_id={session_id}"})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status == 200
+    except urllib.error.HTTPError:
+        return False
+
+
+def expected_ratio(threads: int) -> float:
+    """Minimum throughput with `threads` relative to one thread.
+    """
+    return max(MIN_RATIO, SCALING * min(threads, CPUS))
+
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(tempfile.mkdtemp())
+    os.environ.setdefault("HASH_QUEUE_DEPTH", "4096")
+    os.environ.setdefault("HASH_TIMEOUT", "3600")
+
+    from werkzeug.serving import make_server
+    from app import app
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    for i in range(max(THREADS)):
+        status, _ = post(f"{base_url}/users",
+                         {"email": f"user{i}@holberton.io",
+                          "password": PASSWD})
+        assert status == 200, f"registration failed: {status}"
+
+    failed = 0
+    rates = {}
+    for threads in THREADS:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads, initializer=init_worker) as pool:
+            results = list(pool.map(lambda i: login_profile(base_url),
+                                    range(requests)))
+        elapsed = time.perf_counter() - start
+        failed += results.count(False)
+        rates[threads] = requests / elapsed
+        print(f"{threads:>3} threads: {rates[threads]:7.1f} "
+              f"login+profile/s (x{rates[threads] / rates[1]:.2f}), "
+              f"{results.count(False)} errors")
+    server.shutdown()
+    assert failed == 0, f"{failed} failed requests"
+    for threads, rate in rates.items():
+        ratio = rate / rates[1]
+        assert ratio >= expected_ratio(threads), \
+            f"{threads} threads: x{ratio:.2f} of 1 thread, " \
+            f"x{expected_ratio(threads):.2f} expected on {CPUS} CPUs"
+    print("OK")
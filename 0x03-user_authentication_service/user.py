@@ -16,17 +16,18 @@ class User(Base):
         __tablename__ (str): The name of the table in the database where
             user records are stored.
         id (int): The unique identifier of the user.
-        email (str): The email address of the user.
+        email (str): The email address of the user (unique, indexed).
         hashed_password (str): The hashed password of the user.
         session_id (str): The session ID of the user, used to maintain
-            user sessions.
+            user sessions (unique, indexed).
         reset_token (str): The reset token of the user, used for password
-            resets.
+            resets (unique, indexed).
     """
     __tablename__ = 'users'
 
     id = Column(Integer, primary_key=True)
-    email = Column(String(250), nullable=False)
+    email = Column(String(250), nullable=False, unique=True, index=True)
     hashed_password = Column(String(250), nullable=False)
-    session_id = Column(String(250), nullable=True)
-    reset_token = Column(String(250), nullable=True)
+    session_id = Column(String(250), nullable=True, unique=True, index=True)
+    reset_token = Column(String(250), nullable=True, unique=True,
+                         index=True)